@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""Checks for the agent monitor's delivery guarantees
+
+Drives the monitor's work pool, debouncer and event checkpoint against a stub
+agent, and its FastAgent runtime against fast-agent's passthrough model, so no
+ticketing server, MCP servers or API keys are needed:
+
+    python monitor_checks.py
+
+Each check prints "ok" or fails with an AssertionError.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from contextlib import asynccontextmanager
+import websocket_agent_monitor as monitor
+
+
+def new_checkpoint(directory, seq):
+    path = os.path.join(directory, "state.json")
+    with open(path, "w") as f:
+        json.dump({"seq": seq}, f)
+    return path, monitor.EventCheckpoint(path)
+
+
+def saved_seq(path):
+    with open(path) as f:
+        return json.load(f)["seq"]
+
+
+def deliver(checkpoint, debouncer, seq, ticket_id):
+    """What dispatch() does for a ticket_created event"""
+    checkpoint.hold(seq)
+    try:
+        debouncer.add_ticket({"seq": seq}, {"id": ticket_id, "title": f"Ticket {ticket_id}", "description": "check"})
+    finally:
+        checkpoint.release(seq)
+
+
+async def check_cancelled_turn_keeps_checkpoint():
+    """A turn cancelled at shutdown must not mark its event handled"""
+    with tempfile.TemporaryDirectory() as directory:
+        path, checkpoint = new_checkpoint(directory, 10)
+        started = asyncio.Event()
+
+        async def agent(prompt):
+            started.set()
+            await asyncio.sleep(3600)
+
+        pool = monitor.AgentWorkPool(agent, workers=1)
+        debouncer = monitor.TicketEventDebouncer(pool.submit, window=0, max_wait=0, checkpoint=checkpoint)
+        pool.start()
+        deliver(checkpoint, debouncer, 11, ticket_id=1)
+        await asyncio.wait_for(started.wait(), 5)
+        # Shutdown order from main()
+        debouncer.cancel_all()
+        await pool.stop()
+        assert checkpoint.seq == 10, checkpoint.seq
+        assert saved_seq(path) == 10, saved_seq(path)
+
+
+async def check_finished_turns_advance_checkpoint():
+    """Turns that complete, or fail with an error, release their events"""
+    with tempfile.TemporaryDirectory() as directory:
+        path, checkpoint = new_checkpoint(directory, 10)
+        done = asyncio.Event()
+
+        async def agent(prompt):
+            if "Ticket 2" in prompt:
+                done.set()
+                raise RuntimeError("agent failed")
+
+        pool = monitor.AgentWorkPool(agent, workers=1)
+        debouncer = monitor.TicketEventDebouncer(pool.submit, window=0, max_wait=0, checkpoint=checkpoint)
+        pool.start()
+        deliver(checkpoint, debouncer, 11, ticket_id=1)
+        deliver(checkpoint, debouncer, 12, ticket_id=2)
+        await asyncio.wait_for(done.wait(), 5)
+        await asyncio.sleep(0.05)
+        await pool.stop()
+        assert checkpoint.seq == 12, checkpoint.seq
+        assert saved_seq(path) == 12, saved_seq(path)
+
+
+async def check_ignored_source_is_per_item():
+    """In a merged event only the items from an ignored source are dropped"""
+    submitted = []
+
+    async def submit(ticket_id, prompt, on_done=None):
+        submitted.append(ticket_id)
+
+    debouncer = monitor.TicketEventDebouncer(submit, window=0, max_wait=0, ignore_sources={"api"})
+    # A web UI ticket and an API ticket coalesced into one tickets_created event
+    debouncer.add_ticket({"source": None}, {"id": 1, "title": "web", "description": "", "source": None})
+    debouncer.add_ticket({"source": None}, {"id": 2, "title": "api", "description": "", "source": "api"})
+    debouncer.add_comments({"ticket_id": 1, "source": None},
+                           [{"id": 7, "author": "customer", "message": "web", "source": None},
+                            {"id": 8, "author": "script", "message": "api", "source": "api"}])
+    await asyncio.sleep(0.05)
+    assert submitted == [1], submitted
+    assert debouncer.ignored == 2, debouncer.ignored
+
+
+async def check_backlog_is_bounded():
+    """A burst on a stuck agent holds events back instead of growing the backlog"""
+    async def agent(prompt):
+        await asyncio.sleep(3600)
+
+    pool = monitor.AgentWorkPool(agent, workers=1, max_size=2)
+    debouncer = monitor.TicketEventDebouncer(pool.submit, window=0, max_wait=0, max_pending=3)
+    pool.start()
+    admitted = []
+
+    async def event(ticket_id):
+        # What dispatch() does, without a checkpoint
+        await debouncer.wait_for_room()
+        admitted.append(ticket_id)
+        debouncer.add_ticket({}, {"id": ticket_id, "title": f"Ticket {ticket_id}", "description": "check"})
+
+    events = [asyncio.create_task(event(ticket_id)) for ticket_id in range(20)]
+    await asyncio.sleep(0.1)
+    # One turn running, two queued in the pool, three held by the debouncer
+    assert debouncer.backlog == 3, debouncer.backlog
+    assert admitted == list(range(6)), admitted
+    for task in events:
+        task.cancel()
+    debouncer.cancel_all()
+    await pool.stop()
+    # The prompts still blocked in submit() on the full pool
+    for task in asyncio.all_tasks() - {asyncio.current_task()}:
+        task.cancel()
+
+
+async def check_reset_forgets_tickets():
+    """After a reset, pending events are dropped and reused ticket ids are new again"""
+    submitted = []
+
+    async def submit(ticket_id, prompt, on_done=None):
+        submitted.append(prompt)
+
+    debouncer = monitor.TicketEventDebouncer(submit, window=0.05, max_wait=0.05)
+    debouncer.add_ticket({}, {"id": 1, "title": "before", "description": ""})
+    debouncer.reset()
+    debouncer.add_ticket({}, {"id": 1, "title": "after", "description": ""})
+    await asyncio.sleep(0.2)
+    assert submitted == ["New ticket: after\nDescription: "], submitted
+
+
+async def check_stale_reset_replay_keeps_live_work():
+    """A tickets_reset replayed by catch-up after newer live events changes nothing"""
+    submitted = []
+
+    async def submit(ticket_id, prompt, on_done=None):
+        submitted.append(ticket_id)
+        on_done()
+
+    checkpoint = monitor.EventCheckpoint(None)
+    checkpoint.start_at(10)
+    debouncer = monitor.TicketEventDebouncer(submit, window=0.05, max_wait=0.05, checkpoint=checkpoint)
+    saved = monitor.checkpoint, monitor.debouncer
+    monitor.checkpoint, monitor.debouncer = checkpoint, debouncer
+    try:
+        def created(seq, ticket_id):
+            return {"seq": seq, "ticket": {"id": ticket_id, "title": f"Ticket {ticket_id}", "description": "check"}}
+
+        # Live: a reset, a ticket that gets handled, then one still pending
+        await monitor.dispatch("tickets_reset", {"seq": 11})
+        await monitor.dispatch("ticket_created", created(12, 1))
+        await asyncio.sleep(0.1)
+        await monitor.dispatch("ticket_created", created(13, 2))
+        # Catch-up, started before the reset arrived live, replays the same events
+        await monitor.dispatch("tickets_reset", {"seq": 11}, replay=True)
+        await monitor.dispatch("ticket_created", created(12, 1), replay=True)
+        await monitor.dispatch("ticket_created", created(13, 2), replay=True)
+        await asyncio.sleep(0.1)
+        assert submitted == [1, 2], submitted
+        assert checkpoint.seq == 13, checkpoint.seq
+    finally:
+        monitor.checkpoint, monitor.debouncer = saved
+
+
+async def check_partition_replay_keeps_owned_work():
+    """Replaying a newly claimed partition doesn't reset the ones already owned"""
+    submitted = []
+
+    async def submit(ticket_id, prompt, on_done=None):
+        submitted.append(ticket_id)
+        on_done()
+
+    class Shard:
+        def partition(self, ticket_id):
+            return ticket_id % 2
+
+        def owns(self, ticket_id):
+            return self.partition(ticket_id) == 0
+
+    checkpoint = monitor.EventCheckpoint(None)
+    checkpoint.start_at(20)
+    debouncer = monitor.TicketEventDebouncer(submit, window=0.05, max_wait=0.05, checkpoint=checkpoint)
+    saved = monitor.checkpoint, monitor.debouncer, monitor.shard
+    monitor.checkpoint, monitor.debouncer, monitor.shard = checkpoint, debouncer, Shard()
+    try:
+        ticket = {"id": 2, "title": "Ticket 2", "description": "check"}
+        await monitor.dispatch("ticket_created", {"seq": 21, "ticket": ticket})
+        # The replay for partition 1 reads a reset from the log before it arrives live
+        await monitor.dispatch("ticket_created", {"seq": 21, "ticket": ticket}, partitions={1}, replay=True)
+        await monitor.dispatch("tickets_reset", {"seq": 22}, partitions={1}, replay=True)
+        await asyncio.sleep(0.1)
+        assert submitted == [2], submitted
+        assert checkpoint.seq == 21, checkpoint.seq
+    finally:
+        monitor.checkpoint, monitor.debouncer, monitor.shard = saved
+
+
+async def check_runtime_clears_agent_history():
+    """Turns on the long-lived fast-agent app leave no history behind"""
+    fast = monitor.FastAgent("monitor-checks", parse_cli_args=False, quiet=True)
+
+    # The passthrough model echoes the message, so no API key or MCP server is needed
+    @fast.agent(name="echo", instruction="check", model="passthrough", use_history=False)
+    async def echo():
+        pass
+
+    runtime = monitor.AgentRuntime(fast, "echo")
+    try:
+        for n in range(3):
+            assert await runtime.send(f"turn {n}") == f"turn {n}"
+            assert runtime.app["echo"].message_history == [], runtime.app["echo"].message_history
+        assert runtime.starts == 1, runtime.starts
+    finally:
+        await runtime.stop()
+
+
+async def check_runtime_replaces_agent_without_clear():
+    """An agent with no clear() is replaced by restarting the app before the next turn"""
+    class Agent:
+        async def send(self, message):
+            return message
+
+        async def list_tools(self):
+            return []
+
+    class Fast:
+        @asynccontextmanager
+        async def run(self):
+            yield {"echo": Agent()}
+
+    runtime = monitor.AgentRuntime(Fast(), "echo")
+    try:
+        for n in range(3):
+            assert await runtime.send(f"turn {n}") == f"turn {n}"
+        assert runtime.starts == 3, runtime.starts
+    finally:
+        await runtime.stop()
+
+
+CHECKS = [
+    check_cancelled_turn_keeps_checkpoint,
+    check_finished_turns_advance_checkpoint,
+    check_ignored_source_is_per_item,
+    check_backlog_is_bounded,
+    check_reset_forgets_tickets,
+    check_stale_reset_replay_keeps_live_work,
+    check_partition_replay_keeps_owned_work,
+    check_runtime_clears_agent_history,
+    check_runtime_replaces_agent_without_clear,
+]
+
+
+async def main():
+    for check in CHECKS:
+        await check()
+        print(f"ok  {check.__name__}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
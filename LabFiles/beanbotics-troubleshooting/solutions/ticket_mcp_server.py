@@ -6,19 +6,314 @@ ticketing system API. Agents can create tickets, add comments, and monitor
 support requests for robotic coffee systems.
 """
 from fastmcp import FastMCP
+from fastmcp.exceptions import ResourceError
 from fastmcp.server.context import Context
-from typing import Dict, Any
-import requests
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import base64
+import math
+import os
+import re
+import httpx
+import logging
+import socketio
 from pathlib import Path
 
-# Initialize the FastMCP server
-mcp = FastMCP("BeanBoticsTicketing")
-
 # Configuration
-API_BASE_URL = "http://localhost:5000/api"
+API_BASE_URL = os.environ.get("TICKETS_API_URL", "http://localhost:5000/api")
 TROUBLESHOOTING_DIR = Path(__file__).parent / "troubleshooting"
+HTTP_POOL_SIZE = int(os.environ.get("TICKETS_HTTP_POOL_SIZE", 10))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("TICKETS_HTTP_CONNECT_TIMEOUT", 3.0))
+HTTP_READ_TIMEOUT = float(os.environ.get("TICKETS_HTTP_READ_TIMEOUT", 15.0))
+HTTP_MAX_RETRIES = int(os.environ.get("TICKETS_HTTP_MAX_RETRIES", 3))
+HTTP_RETRY_BACKOFF = 0.2  # seconds, doubled after each attempt
+RETRY_STATUSES = {502, 503, 504}
+# Optional local ticket cache kept current from the ticketing Socket.IO events
+TICKET_CACHE_ENABLED = os.environ.get("TICKETS_CACHE", "").lower() in ("1", "true", "yes")
+TICKETS_SOCKET_URL = os.environ.get("TICKETS_SOCKET_URL", API_BASE_URL.rsplit("/api", 1)[0])
+
+logger = logging.getLogger(__name__)
+
+# One pooled keep-alive client shared by every tool call and session in this process
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_users = 0
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it on first use"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            base_url=API_BASE_URL,
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+        )
+    return _http_client
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP):
+    """Open the shared HTTP client and ticket cache with the server and close them when the last session ends"""
+    global _http_client, _http_client_users
+    get_http_client()
+    _http_client_users += 1
+    if _http_client_users == 1:
+        ticket_cache.start()
+    try:
+        yield
+    finally:
+        _http_client_users -= 1
+        if _http_client_users == 0:
+            await ticket_cache.stop()
+            if _http_client is not None:
+                await _http_client.aclose()
+                _http_client = None
+
+async def api_request(method: str, path: str, **kwargs) -> httpx.Response:
+    """Call the ticketing API, retrying transient failures with exponential backoff
+
+    Connection failures are always retried since the request never reached the
+    server; read timeouts only for GETs so a slow POST is never duplicated.
+    """
+    client = get_http_client()
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        last_attempt = attempt == HTTP_MAX_RETRIES
+        try:
+            response = await client.request(method, path, **kwargs)
+            if response.status_code not in RETRY_STATUSES or last_attempt:
+                return response
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+            if last_attempt:
+                raise
+        except httpx.ReadTimeout:
+            if method != "GET" or last_attempt:
+                raise
+        await asyncio.sleep(HTTP_RETRY_BACKOFF * 2 ** attempt)
+
+def encode_cursor(ticket: Dict[str, Any]) -> str:
+    """Build the same opaque cursor the ticketing API uses, so paging can switch between cache and API"""
+    return base64.urlsafe_b64encode(f"{ticket['created_at']}|{ticket['id']}".encode()).decode()
+
+def ticket_sort_key(created_at: str, ticket_id: int) -> Tuple[datetime, int]:
+    """(created_at, id) as the API orders tickets, newest first when reversed"""
+    created = datetime.fromisoformat(created_at)
+    if created.tzinfo is not None:
+        created = created.astimezone(timezone.utc).replace(tzinfo=None)
+    return created, ticket_id
+
+class TicketCache:
+    """In-process copy of every ticket, kept current from the ticketing Socket.IO events
+
+    On connect the cache pages through the API once to load all tickets with
+    their comments, then applies ticket_created, comment_created and
+    ticket_deleted events (and their batched forms) as they arrive. Events
+    received during the load are replayed after it; applying an event twice
+    is harmless. A tickets_reset event (every ticket deleted, on seeding)
+    starts a fresh load. While disconnected or loading the cache is not ready
+    and the tools fall back to HTTP, and every reconnect reloads since events
+    may have been missed in between.
+    """
+
+    EVENTS = ('ticket_created', 'tickets_created', 'comment_created', 'comments_created', 'ticket_deleted',
+              'tickets_reset')
+    LOAD_FIELDS = "id,title,description,status,priority,created_at,comments"
+    LOAD_PAGE_SIZE = 500
+
+    def __init__(self, url: str, enabled: bool = True):
+        self.url = url
+        self.enabled = enabled
+        self.tickets: Dict[int, Dict[str, Any]] = {}
+        self.ready = False
+        self.hits = 0
+        self.misses = 0
+        self.events_applied = 0
+        self.loads = 0
+        self.last_error: Optional[str] = None
+        self._pending: Optional[List[Tuple[str, Dict[str, Any]]]] = None
+        self._connect_task: Optional[asyncio.Task] = None
+        self._load_task: Optional[asyncio.Task] = None
+        self.sio = socketio.AsyncClient()
+        self.sio.on('connect', self._on_connect)
+        self.sio.on('disconnect', self._on_disconnect)
+        for event in self.EVENTS:
+            self.sio.on(event, self._event_handler(event))
+
+    def start(self):
+        if self.enabled:
+            self._connect_task = asyncio.create_task(self._connect())
+
+    async def stop(self):
+        self.ready = False
+        for task in (self._connect_task, self._load_task):
+            if task is not None:
+                task.cancel()
+        if self.sio.connected:
+            await self.sio.disconnect()
+
+    async def _connect(self):
+        """Connect, retrying until the ticketing server is up; later reconnects are automatic"""
+        delay = HTTP_RETRY_BACKOFF
+        while True:
+            try:
+                await self.sio.connect(self.url, transports=['websocket'])
+                return
+            except socketio.exceptions.ConnectionError as e:
+                self.last_error = f"connect failed: {e}"
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    async def _on_connect(self):
+        if self._load_task is not None:
+            self._load_task.cancel()
+        self._load_task = asyncio.create_task(self._load())
+
+    async def _on_disconnect(self):
+        self.ready = False
+        if self._load_task is not None:
+            self._load_task.cancel()
+
+    def _event_handler(self, event: str):
+        async def handler(data):
+            if event == 'tickets_reset':
+                # Events queued by a load in progress predate the reset; the new load covers them
+                await self._on_connect()
+            elif self._pending is not None:
+                self._pending.append((event, data))
+            else:
+                self._apply(event, data)
+        return handler
+
+    async def _load(self):
+        """Load every ticket from the API, retrying with backoff until it succeeds"""
+        self.ready = False
+        self._pending = []
+        delay = HTTP_RETRY_BACKOFF
+        while True:
+            try:
+                tickets = await self._fetch_all()
+                break
+            except Exception as e:
+                self.last_error = f"load failed: {e}"
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+        self.tickets = tickets
+        pending, self._pending = self._pending, None
+        for event, data in pending:
+            self._apply(event, data)
+        self.loads += 1
+        self.last_error = None
+        self.ready = self.sio.connected
+
+    async def _fetch_all(self) -> Dict[int, Dict[str, Any]]:
+        tickets = {}
+        params = {"fields": self.LOAD_FIELDS, "limit": self.LOAD_PAGE_SIZE}
+        while True:
+            response = await api_request("GET", "/tickets", params=params)
+            response.raise_for_status()
+            data = response.json()
+            for ticket in data["tickets"]:
+                tickets[ticket["id"]] = ticket
+            if not data.get("next_cursor"):
+                return tickets
+            params["cursor"] = data["next_cursor"]
+
+    def _apply(self, event: str, data: Dict[str, Any]):
+        if event in ('ticket_created', 'tickets_created'):
+            for ticket in data['tickets'] if event == 'tickets_created' else [data['ticket']]:
+                if ticket['id'] not in self.tickets:
+                    self.tickets[ticket['id']] = {
+                        **{key: ticket.get(key) for key in ('id', 'title', 'description', 'status', 'priority', 'created_at')},
+                        'comments': []
+                    }
+        elif event in ('comment_created', 'comments_created'):
+            self._add_comments(data['ticket_id'], data['comments'] if event == 'comments_created' else [data['comment']])
+        elif event == 'ticket_deleted':
+            self.tickets.pop(data['ticket_id'], None)
+        self.events_applied += 1
+
+    def _add_comments(self, ticket_id: int, comments: List[Dict[str, Any]]):
+        ticket = self.tickets.get(ticket_id)
+        if ticket is not None:
+            known = {c['id'] for c in ticket['comments']}
+            # Merged events tag comments with their event's source, which the API doesn't return
+            ticket['comments'].extend({key: value for key, value in c.items() if key != 'source'}
+                                      for c in comments if c['id'] not in known)
+
+    def add_comment(self, ticket_id: int, comment: Dict[str, Any]):
+        """Record a comment created through the API, so a read right after sees it
+
+        Its comment_created event arrives later and is then skipped as a duplicate.
+        """
+        self._add_comments(ticket_id, [comment])
+
+    def _count(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def get(self, ticket_id: int) -> Optional[Dict[str, Any]]:
+        """A copy of the ticket with its comments, or None to fall back to the API"""
+        if not self.enabled:
+            return None
+        ticket = self.tickets.get(ticket_id) if self.ready else None
+        self._count(ticket is not None)
+        return {**ticket, 'comments': list(ticket['comments'])} if ticket is not None else None
+
+    def page(self, status: Optional[str] = None, priority: Optional[str] = None,
+             cursor: Optional[str] = None, limit: Optional[int] = None
+             ) -> Optional[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """Filter and page tickets like GET /tickets with LIST_FIELDS
+
+        Returns (tickets, next_cursor), or None to fall back to the API, which
+        also reports invalid cursors and limits.
+        """
+        if not self.enabled:
+            return None
+        if not self.ready or (limit is not None and not 1 <= limit <= 500):
+            self._count(False)
+            return None
+        tickets = [t for t in self.tickets.values()
+                   if (status is None or t['status'] == status) and (priority is None or t['priority'] == priority)]
+        if cursor:
+            try:
+                created_at, ticket_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+                after = ticket_sort_key(created_at, int(ticket_id))
+            except (ValueError, UnicodeDecodeError):
+                self._count(False)
+                return None
+            tickets = [t for t in tickets if ticket_sort_key(t['created_at'], t['id']) < after]
+        tickets.sort(key=lambda t: ticket_sort_key(t['created_at'], t['id']), reverse=True)
+        next_cursor = None
+        if limit is not None and len(tickets) > limit:
+            tickets = tickets[:limit]
+            next_cursor = encode_cursor(tickets[-1])
+        self._count(True)
+        return [{**{key: t[key] for key in LIST_FIELDS.split(',') if key in t}, 'comment_count': len(t['comments'])}
+                for t in tickets], next_cursor
 
-def handle_api_error(response: requests.Response) -> str:
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "connected": self.sio.connected,
+            "tickets": len(self.tickets),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "events_applied": self.events_applied,
+            "loads": self.loads,
+            "last_error": self.last_error
+        }
+
+ticket_cache = TicketCache(TICKETS_SOCKET_URL, enabled=TICKET_CACHE_ENABLED)
+
+# Initialize the FastMCP server
+mcp = FastMCP("BeanBoticsTicketing", lifespan=server_lifespan)
+
+def handle_api_error(response: httpx.Response) -> str:
     """Handle API errors gracefully"""
     try:
         error_data = response.json()
@@ -26,41 +321,217 @@ def handle_api_error(response: requests.Response) -> str:
     except:
         return f"API Error {response.status_code}: {response.text}"
 
-def load_troubleshooting_guide(filename: str) -> str:
-    """Load a troubleshooting guide from markdown file"""
+def load_troubleshooting_guide(filename: str) -> Optional[str]:
+    """Load a troubleshooting guide from markdown file, or log why it can't be and return None"""
+    guide_path = TROUBLESHOOTING_DIR / f"{filename}.md"
     try:
-        guide_path = TROUBLESHOOTING_DIR / f"{filename}.md"
-        return guide_path.read_text(encoding='utf-8') if guide_path.exists() else f"Guide not found: {filename}.md"
-    except Exception as e:
-        return f"Error loading guide {filename}: {str(e)}"
+        return guide_path.read_text(encoding='utf-8')
+    except OSError as e:
+        logger.error("Troubleshooting guide %s not loaded, leaving it out: %s", filename, e)
+        return None
+
+# Troubleshooting guides, with the descriptions shown to the model when sampling
+GUIDE_DESCRIPTIONS = {
+    "robotic_arm": "For robotic arm issues, error codes E003, servo problems, movement failures",
+    "grinder_motor": "For grinder motor overcurrent, grinding issues, burr problems",
+    "facial_recognition": "For customer recognition failures, camera issues, identification problems",
+    "boiler_temperature": "For water temperature issues, heating problems, thermal control",
+    "milk_frother": "For milk frothing issues, steam wand problems, foam quality",
+    "bean_hopper": "For bean hopper sensor issues, level detection, insufficient beans errors"
+}
+DEFAULT_GUIDE = "robotic_arm"
+
+# Words or phrases that on their own identify a guide; error codes (E003) are
+# added from the guide text itself
+GUIDE_KEYWORDS = {
+    "robotic_arm": ["robotic arm", "robot arm", "servo", "servos", "arm frozen", "arm stuck"],
+    "grinder_motor": ["grinder", "grinding", "grind", "burr", "burrs", "overcurrent"],
+    "facial_recognition": ["facial", "face", "faces", "recognition", "recognize", "recognized",
+                           "recognise", "recognised", "camera"],
+    "boiler_temperature": ["boiler", "water temperature", "heating element", "thermostat", "lukewarm"],
+    "milk_frother": ["milk", "froth", "frother", "frothing", "foam", "steam wand"],
+    "bean_hopper": ["hopper", "insufficient beans", "bean level", "out of beans"]
+}
+
+# BM25 routing is only trusted when the best guide clearly beats the runner-up
+BM25_MIN_SCORE = 1.2  # about one term that appears in a single guide
+BM25_MIN_MARGIN = 1.5
+STOPWORDS = set("""a an and are as at be but by for from has have i in is it its my no not of on or our
+so that the their there this to too up was we were when with without won't doesn't isn't can't""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS]
+
+def normalize_issue(text: str) -> str:
+    """Cache key for an issue description: lowercase words, punctuation and spacing dropped"""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+class GuideRouter:
+    """Picks a troubleshooting guide locally when the issue text makes the choice obvious
+
+    Tries, in order: error codes that appear in exactly one guide, keywords
+    that hit exactly one guide, and BM25 over the guide text that clearly
+    favours one guide. Returns None when none of these is confident, or the
+    keywords hit several guides, so the caller can fall back to sampling.
+    """
+
+    def __init__(self, guides: Dict[str, str], keywords: Dict[str, List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.error_codes: Dict[str, set] = {}
+        for name, text in guides.items():
+            for code in re.findall(r"\bE\d{3}\b", text):
+                self.error_codes.setdefault(code.lower(), set()).add(name)
+        self.keywords = {name: [re.compile(r"\b" + re.escape(k) + r"\b") for k in words]
+                         for name, words in keywords.items()}
+        self.term_freqs = {name: Counter(tokenize(text)) for name, text in guides.items()}
+        self.lengths = {name: sum(tf.values()) for name, tf in self.term_freqs.items()}
+        self.avg_length = sum(self.lengths.values()) / max(len(self.lengths), 1)
+        doc_freqs = Counter(term for tf in self.term_freqs.values() for term in tf)
+        n = len(guides)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()}
+
+    def bm25(self, text: str) -> Dict[str, float]:
+        terms = tokenize(text)
+        scores = {}
+        for name, tf in self.term_freqs.items():
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[name] / self.avg_length)
+            scores[name] = sum(self.idf.get(t, 0) * tf[t] * (self.k1 + 1) / (tf[t] + norm) for t in terms if t in tf)
+        return scores
+
+    def route(self, text: str) -> Optional[Tuple[str, str]]:
+        """Return (guide_name, reason) for a confident match, else None"""
+        lowered = text.lower()
+        code_matches = {name for code in re.findall(r"\be\d{3}\b", lowered)
+                        for name in self.error_codes.get(code, ())}
+        if len(code_matches) == 1:
+            return code_matches.pop(), "error code"
+
+        # Synonyms overlap ("milk frother" hits three milk_frother keywords), so
+        # hit counts don't say which guide an issue is about. Keywords for a
+        # second guide ("grinder jammed, milk frother is fine") make it ambiguous,
+        # and BM25 would only count the same words again, so leave it to sampling
+        keyword_matches = {name for name, patterns in self.keywords.items()
+                           if any(pattern.search(lowered) for pattern in patterns)}
+        if len(keyword_matches) == 1:
+            return keyword_matches.pop(), "keywords"
+        if keyword_matches:
+            return None
+
+        scores = self.bm25(text)
+        if not scores:
+            return None
+        best = max(scores, key=scores.get)
+        best_score = scores[best]
+        runner_up = max((score for name, score in scores.items() if name != best), default=0.0)
+        if best_score >= BM25_MIN_SCORE and best_score >= BM25_MIN_MARGIN * runner_up:
+            return best, "bm25"
+        return None
+
+    def best_guess(self, text: str) -> str:
+        scores = self.bm25(text)
+        best = max(scores, key=scores.get)
+        return best if scores[best] > 0 else DEFAULT_GUIDE
+
+class SelectionCache:
+    """LRU cache of sampled guide selections keyed on normalized issue text"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, issue: str) -> Optional[str]:
+        key = normalize_issue(issue)
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def set(self, issue: str, guide: str):
+        key = normalize_issue(issue)
+        self._entries[key] = guide
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+def slugify(heading: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", heading.lower()).strip("-")
+
+def index_sections(markdown: str) -> Dict[str, Dict[str, Any]]:
+    """Map heading slug -> {heading, level, content} for every ## and deeper heading
+
+    A section runs until the next heading at the same or a higher level, so a
+    ## section includes its ### subsections.
+    """
+    lines = markdown.splitlines()
+    headings = [(i, len(m.group(1)), m.group(2).strip())
+                for i, line in enumerate(lines) if (m := re.match(r"(#{2,6})\s+(.*)", line))]
+    sections = {}
+    for position, (start, level, heading) in enumerate(headings):
+        end = next((i for i, lvl, _ in headings[position + 1:] if lvl <= level), len(lines))
+        slug = base = slugify(heading)
+        suffix = 2
+        while slug in sections:
+            slug, suffix = f"{base}-{suffix}", suffix + 1
+        sections[slug] = {"heading": heading, "level": level,
+                          "content": "\n".join(lines[start:end]).strip()}
+    return sections
+
+# Guides are read and indexed once at startup; every tool call and resource
+# read serves them from memory. Guides whose file is missing are left out of
+# everything, so they are never routed to or served as placeholder text
+GUIDES = {name: text for name in GUIDE_DESCRIPTIONS if (text := load_troubleshooting_guide(name)) is not None}
+if GUIDES and DEFAULT_GUIDE not in GUIDES:
+    DEFAULT_GUIDE = next(iter(GUIDES))
+GUIDE_SECTIONS = {name: index_sections(text) for name, text in GUIDES.items()}
+guide_router = GuideRouter({name: f"{GUIDE_DESCRIPTIONS[name]}\n{text}" for name, text in GUIDES.items()},
+                           {name: words for name, words in GUIDE_KEYWORDS.items() if name in GUIDES})
+sampled_selections = SelectionCache()
+
+# Fields requested for ticket listings; full comments are fetched per ticket via get_ticket
+LIST_FIELDS = "id,title,description,status,priority,created_at,comment_count"
+PAGE_SIZE = 50
 
 @mcp.tool()
-def list_tickets() -> Dict[str, Any]:
-    """Get all tickets from the BeanBotics ticketing system.
+async def list_tickets(cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Dict[str, Any]:
+    """Get a page of tickets from the BeanBotics ticketing system, newest first.
+    
+    Args:
+        cursor: Cursor from a previous call's next_cursor to fetch the following page
+        limit: Maximum number of tickets to return (1-500)
     
     Returns:
-        Dictionary containing list of all tickets with their details
+        Dictionary containing a page of tickets with their details and comment counts
     """
     try:
-        response = requests.get(f"{API_BASE_URL}/tickets")
-        
-        if response.status_code == 200:
-            tickets = response.json()
-            return {
-                "tickets": tickets,
-                "count": len(tickets),
-                "summary": f"Found {len(tickets)} tickets in the system"
-            }
+        cached = ticket_cache.page(cursor=cursor, limit=limit)
+        if cached is not None:
+            tickets, next_cursor = cached
         else:
-            return {"error": handle_api_error(response)}
+            params = {"fields": LIST_FIELDS, "limit": limit}
+            if cursor:
+                params["cursor"] = cursor
+            response = await api_request("GET", "/tickets", params=params)
+            if response.status_code != 200:
+                return {"error": handle_api_error(response)}
+            data = response.json()
+            tickets, next_cursor = data["tickets"], data.get("next_cursor")
+        
+        return {
+            "tickets": tickets,
+            "count": len(tickets),
+            "next_cursor": next_cursor,
+            "summary": f"Found {len(tickets)} tickets" + (" (more available via next_cursor)" if next_cursor else "")
+        }
     
-    except requests.exceptions.ConnectionError:
-        return {"error": "Could not connect to ticketing system. Is the server running on localhost:5000?"}
+    except httpx.ConnectError:
+        return {"error": f"Could not connect to ticketing system. Is the server running at {API_BASE_URL}?"}
+    except httpx.TimeoutException:
+        return {"error": "Ticketing system did not respond in time"}
     except Exception as e:
         return {"error": f"Unexpected error: {str(e)}"}
 
 @mcp.tool()
-def get_ticket(ticket_id: int) -> Dict[str, Any]:
+async def get_ticket(ticket_id: int) -> Dict[str, Any]:
     """Get detailed information about a specific ticket including comments.
     
     Args:
@@ -70,28 +541,33 @@ def get_ticket(ticket_id: int) -> Dict[str, Any]:
         Dictionary containing ticket details and all comments
     """
     try:
-        response = requests.get(f"{API_BASE_URL}/tickets/{ticket_id}")
-        
-        if response.status_code == 200:
+        ticket = ticket_cache.get(ticket_id)
+        if ticket is None:
+            response = await api_request("GET", f"/tickets/{ticket_id}")
+            if response.status_code == 404:
+                return {"error": f"Ticket #{ticket_id} not found"}
+            elif response.status_code != 200:
+                return {"error": handle_api_error(response)}
             ticket = response.json()
-            comment_count = len(ticket.get('comments', []))
-            return {
-                **ticket,
-                "comment_count": comment_count,
-                "summary": f"Ticket #{ticket_id}: {ticket.get('title', 'Unknown')} ({comment_count} comments)"
-            }
-        elif response.status_code == 404:
-            return {"error": f"Ticket #{ticket_id} not found"}
-        else:
-            return {"error": handle_api_error(response)}
+            # Only used for HTTP caching; the ticket cache does not track it
+            ticket.pop("revision", None)
+        
+        comment_count = len(ticket.get('comments', []))
+        return {
+            **ticket,
+            "comment_count": comment_count,
+            "summary": f"Ticket #{ticket_id}: {ticket.get('title', 'Unknown')} ({comment_count} comments)"
+        }
     
-    except requests.exceptions.ConnectionError:
-        return {"error": "Could not connect to ticketing system. Is the server running on localhost:5000?"}
+    except httpx.ConnectError:
+        return {"error": f"Could not connect to ticketing system. Is the server running at {API_BASE_URL}?"}
+    except httpx.TimeoutException:
+        return {"error": "Ticketing system did not respond in time"}
     except Exception as e:
         return {"error": f"Unexpected error: {str(e)}"}
 
 @mcp.tool()
-def add_comment(
+async def add_comment(
     ticket_id: int,
     author: str,
     message: str
@@ -112,10 +588,11 @@ def add_comment(
             "message": message
         }
         
-        response = requests.post(f"{API_BASE_URL}/tickets/{ticket_id}/comments", json=payload)
+        response = await api_request("POST", f"/tickets/{ticket_id}/comments", json=payload)
         
         if response.status_code == 201:
             comment = response.json()
+            ticket_cache.add_comment(ticket_id, comment)
             return {
                 **comment,
                 "summary": f"Added comment to ticket #{ticket_id} by {author}"
@@ -125,13 +602,15 @@ def add_comment(
         else:
             return {"error": handle_api_error(response)}
     
-    except requests.exceptions.ConnectionError:
-        return {"error": "Could not connect to ticketing system. Is the server running on localhost:5000?"}
+    except httpx.ConnectError:
+        return {"error": f"Could not connect to ticketing system. Is the server running at {API_BASE_URL}?"}
+    except httpx.TimeoutException:
+        return {"error": "Ticketing system did not respond in time"}
     except Exception as e:
         return {"error": f"Unexpected error: {str(e)}"}
 
 @mcp.tool()
-def search_tickets_by_status(status: str) -> Dict[str, Any]:
+async def search_tickets_by_status(status: str) -> Dict[str, Any]:
     """Find tickets by their status.
     
     Args:
@@ -141,29 +620,32 @@ def search_tickets_by_status(status: str) -> Dict[str, Any]:
         Dictionary containing filtered tickets
     """
     try:
-        # Get all tickets and filter by status
-        response = requests.get(f"{API_BASE_URL}/tickets")
-        
-        if response.status_code == 200:
-            all_tickets = response.json()
-            filtered_tickets = [t for t in all_tickets if t.get('status', '').lower() == status.lower()]
-            
-            return {
-                "tickets": filtered_tickets,
-                "count": len(filtered_tickets),
-                "status": status,
-                "summary": f"Found {len(filtered_tickets)} tickets with status '{status}'"
-            }
+        cached = ticket_cache.page(status=status.lower())
+        if cached is not None:
+            filtered_tickets = cached[0]
         else:
-            return {"error": handle_api_error(response)}
+            # Filter on the server so only matching tickets are transferred
+            response = await api_request("GET", "/tickets", params={"status": status.lower(), "fields": LIST_FIELDS})
+            if response.status_code != 200:
+                return {"error": handle_api_error(response)}
+            filtered_tickets = response.json()["tickets"]
+        
+        return {
+            "tickets": filtered_tickets,
+            "count": len(filtered_tickets),
+            "status": status,
+            "summary": f"Found {len(filtered_tickets)} tickets with status '{status}'"
+        }
     
-    except requests.exceptions.ConnectionError:
-        return {"error": "Could not connect to ticketing system. Is the server running on localhost:5000?"}
+    except httpx.ConnectError:
+        return {"error": f"Could not connect to ticketing system. Is the server running at {API_BASE_URL}?"}
+    except httpx.TimeoutException:
+        return {"error": "Ticketing system did not respond in time"}
     except Exception as e:
         return {"error": f"Unexpected error: {str(e)}"}
 
 @mcp.tool()
-def search_tickets_by_priority(priority: str) -> Dict[str, Any]:
+async def search_tickets_by_priority(priority: str) -> Dict[str, Any]:
     """Find tickets by their priority level.
     
     Args:
@@ -173,35 +655,78 @@ def search_tickets_by_priority(priority: str) -> Dict[str, Any]:
         Dictionary containing filtered tickets
     """
     try:
-        # Get all tickets and filter by priority
-        response = requests.get(f"{API_BASE_URL}/tickets")
+        cached = ticket_cache.page(priority=priority.lower())
+        if cached is not None:
+            filtered_tickets = cached[0]
+        else:
+            # Filter on the server so only matching tickets are transferred
+            response = await api_request("GET", "/tickets", params={"priority": priority.lower(), "fields": LIST_FIELDS})
+            if response.status_code != 200:
+                return {"error": handle_api_error(response)}
+            filtered_tickets = response.json()["tickets"]
+        
+        return {
+            "tickets": filtered_tickets,
+            "count": len(filtered_tickets),
+            "priority": priority,
+            "summary": f"Found {len(filtered_tickets)} tickets with priority '{priority}'"
+        }
+    
+    except httpx.ConnectError:
+        return {"error": f"Could not connect to ticketing system. Is the server running at {API_BASE_URL}?"}
+    except httpx.TimeoutException:
+        return {"error": "Ticketing system did not respond in time"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+@mcp.tool()
+async def search_tickets(query: str, limit: int = 10) -> Dict[str, Any]:
+    """Full-text search across ticket titles, descriptions and comments.
+    
+    Use this to find tickets mentioning an error code, component or symptom
+    (e.g. "E003" or "boiler fluctuating") instead of listing every ticket.
+    
+    Args:
+        query: Words to search for; all words must match
+        limit: Maximum number of tickets to return (1-100)
+    
+    Returns:
+        Dictionary containing matching tickets, most relevant first, each with a snippet
+    """
+    try:
+        response = await api_request("GET", "/tickets/search", params={"q": query, "limit": limit})
         
         if response.status_code == 200:
-            all_tickets = response.json()
-            filtered_tickets = [t for t in all_tickets if t.get('priority', '').lower() == priority.lower()]
-            
+            results = response.json()["results"]
             return {
-                "tickets": filtered_tickets,
-                "count": len(filtered_tickets),
-                "priority": priority,
-                "summary": f"Found {len(filtered_tickets)} tickets with priority '{priority}'"
+                "tickets": results,
+                "count": len(results),
+                "query": query,
+                "summary": f"Found {len(results)} tickets matching '{query}'"
             }
         else:
             return {"error": handle_api_error(response)}
     
-    except requests.exceptions.ConnectionError:
-        return {"error": "Could not connect to ticketing system. Is the server running on localhost:5000?"}
+    except httpx.ConnectError:
+        return {"error": f"Could not connect to ticketing system. Is the server running at {API_BASE_URL}?"}
+    except httpx.TimeoutException:
+        return {"error": "Ticketing system did not respond in time"}
     except Exception as e:
         return {"error": f"Unexpected error: {str(e)}"}
 
-
+@mcp.resource("tickets://cache/stats")
+def ticket_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and state of the local ticket cache (enable with TICKETS_CACHE=1)"""
+    return ticket_cache.stats()
 
 @mcp.tool()
 async def get_troubleshooting_guide(issue_description: str, ctx: Context = None) -> Dict[str, Any]:
-    """Get the most relevant troubleshooting guide for a BeanBotics issue using AI selection.
+    """Get the most relevant troubleshooting guide for a BeanBotics issue.
     
-    Uses MCP sampling to intelligently select the best troubleshooting guide and returns
-    the complete markdown document with detailed troubleshooting steps.
+    Issues that name an error code or an obvious component are matched to a
+    guide locally; otherwise MCP sampling selects the guide, and the choice is
+    cached for repeats of the same issue text. Returns the complete markdown
+    document with detailed troubleshooting steps.
     
     Args:
         issue_description: Description of the issue, symptoms, or error message
@@ -213,47 +738,78 @@ async def get_troubleshooting_guide(issue_description: str, ctx: Context = None)
         - guide_name: Name of the selected guide
         - selection_reason: Why this guide was chosen
     """
-    # Available guides
-    available_guides = [
-        "robotic_arm - For robotic arm issues, error codes E003, servo problems, movement failures",
-        "grinder_motor - For grinder motor overcurrent, grinding issues, burr problems", 
-        "facial_recognition - For customer recognition failures, camera issues, identification problems",
-        "boiler_temperature - For water temperature issues, heating problems, thermal control",
-        "milk_frother - For milk frothing issues, steam wand problems, foam quality",
-        "bean_hopper - For bean hopper sensor issues, level detection, insufficient beans errors"
-    ]
-    
-    # Create sampling prompt
-    prompt = f"""Issue: {issue_description}
+    if not GUIDES:
+        return {"error": f"No troubleshooting guides could be loaded from {TROUBLESHOOTING_DIR}"}
+    routed = guide_router.route(issue_description)
+    if routed is not None:
+        selected_guide, method = routed
+        reason = f"Matched {selected_guide.replace('_', ' ')} troubleshooting guide by {method} for issue: {issue_description}"
+    elif (cached := sampled_selections.get(issue_description)) is not None:
+        selected_guide = cached
+        reason = f"AI-selected {selected_guide.replace('_', ' ')} troubleshooting guide (cached) based on issue: {issue_description}"
+    elif ctx is None:
+        selected_guide = guide_router.best_guess(issue_description)
+        reason = f"Best local match {selected_guide.replace('_', ' ')} troubleshooting guide for issue: {issue_description}"
+    else:
+        # Create sampling prompt
+        prompt = f"""Issue: {issue_description}
 
 Available troubleshooting guides:
-{chr(10).join(['- ' + guide for guide in available_guides])}
+{chr(10).join(f'- {name} - {GUIDE_DESCRIPTIONS[name]}' for name in GUIDES)}
 
 Select the most relevant guide by responding with ONLY the guide name (e.g., "robotic_arm"):"""
-    
-    # Use MCP sampling to get AI selection
-    response = await ctx.sample(messages=prompt)
-    
-    # Extract guide name from response
-    selected_guide = response.text.strip().lower()
-    
-    # Validate selection
-    valid_guides = ["robotic_arm", "grinder_motor", "facial_recognition", 
-                   "boiler_temperature", "milk_frother", "bean_hopper"]
-    
-    if selected_guide not in valid_guides:
-        selected_guide = "robotic_arm"  # Default if invalid response
-    
-    # Load the selected guide
-    guide_content = load_troubleshooting_guide(selected_guide)
+        
+        # Use MCP sampling to get AI selection
+        response = await ctx.sample(messages=prompt)
+        
+        # Extract guide name from response
+        selected_guide = response.text.strip().lower()
+        
+        # Validate selection
+        if selected_guide in GUIDES:
+            sampled_selections.set(issue_description, selected_guide)
+        else:
+            selected_guide = DEFAULT_GUIDE  # Default if invalid response
+        reason = f"AI-selected {selected_guide.replace('_', ' ')} troubleshooting guide based on issue: {issue_description}"
     
     return {
         "guide_name": selected_guide,
-        "full_markdown_content": guide_content,
-        "content": guide_content,  # Backward compatibility
-        "selection_reason": f"AI-selected {selected_guide.replace('_', ' ')} troubleshooting guide based on issue: {issue_description}"
+        "full_markdown_content": GUIDES[selected_guide],
+        "sections": guide_section_list(selected_guide),
+        "selection_reason": reason
     }
 
+def guide_section_list(name: str) -> List[Dict[str, str]]:
+    return [{"heading": section["heading"], "uri": f"guide://{name}/section/{slug}"}
+            for slug, section in GUIDE_SECTIONS[name].items()]
+
+def get_guide(name: str) -> str:
+    if name not in GUIDES:
+        raise ResourceError(f"Unknown guide '{name}'. Available guides: {', '.join(GUIDES)}")
+    return GUIDES[name]
+
+@mcp.resource("guide://index", mime_type="application/json")
+def guide_index() -> Dict[str, Any]:
+    """Every troubleshooting guide with its description and section URIs"""
+    return {name: {"description": GUIDE_DESCRIPTIONS[name], "uri": f"guide://{name}",
+                   "sections": guide_section_list(name)}
+            for name in GUIDES}
+
+@mcp.resource("guide://{name}", mime_type="text/markdown")
+def guide_resource(name: str) -> str:
+    """A complete troubleshooting guide in markdown"""
+    return get_guide(name)
+
+@mcp.resource("guide://{name}/section/{heading}", mime_type="text/markdown")
+def guide_section_resource(name: str, heading: str) -> str:
+    """One section of a troubleshooting guide, addressed by heading text or its slug
+    (e.g. guide://robotic_arm/section/diagnostic-steps)"""
+    get_guide(name)
+    section = GUIDE_SECTIONS[name].get(slugify(heading))
+    if section is None:
+        raise ResourceError(f"Guide '{name}' has no section '{heading}'. "
+                            f"Sections: {', '.join(GUIDE_SECTIONS[name])}")
+    return section["content"]
 
 
 if __name__ == "__main__":
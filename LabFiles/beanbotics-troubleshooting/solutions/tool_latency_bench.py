@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Tool-call latency benchmark for the ticket MCP server
+
+Starts a local stand-in for the ticketing API (an aiohttp app on its own
+thread, answering GET /api/tickets, GET /api/tickets/<id> and POST
+/api/tickets/<id>/comments after an optional delay), points
+ticket_mcp_server.py at it and calls the list_tickets, get_ticket and
+add_comment tools through an in-memory MCP client from several concurrent
+callers. Each run is made twice:
+- pooled: the server as shipped, one keep-alive httpx.AsyncClient
+- per-call: every request on a new connection with a blocking requests call,
+  as the tools did before the shared client
+
+    python tool_latency_bench.py --calls 300 --concurrency 8 --api-latency 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+import requests
+from aiohttp import web
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of durations"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))]
+
+
+def stand_in_api(tickets, latency):
+    """aiohttp app serving the parts of the ticketing API the benchmarked tools call"""
+    created_at = datetime(2024, 1, 1).isoformat()
+    store = {i: {"id": i, "title": f"Ticket {i}", "description": "Stand-in ticket", "status": "open",
+                 "priority": "medium", "created_at": created_at, "revision": 1, "comments": []}
+             for i in range(1, tickets + 1)}
+
+    async def list_tickets(request):
+        await asyncio.sleep(latency)
+        limit = int(request.query.get("limit", 50))
+        page = [{**{k: v for k, v in t.items() if k != "comments"}, "comment_count": len(t["comments"])}
+                for t in list(store.values())[:limit]]
+        return web.json_response({"tickets": page, "next_cursor": None})
+
+    async def get_ticket(request):
+        await asyncio.sleep(latency)
+        ticket = store.get(int(request.match_info["ticket_id"]))
+        if ticket is None:
+            return web.json_response({"error": "Ticket not found"}, status=404)
+        return web.json_response(ticket)
+
+    async def add_comment(request):
+        await asyncio.sleep(latency)
+        ticket = store.get(int(request.match_info["ticket_id"]))
+        if ticket is None:
+            return web.json_response({"error": "Ticket not found"}, status=404)
+        body = await request.json()
+        # Only the newest few are kept so get_ticket stays the same size throughout
+        comment = {"id": random.randrange(1 << 30), "ticket_id": ticket["id"], "author": body["author"],
+                   "message": body["message"], "created_at": created_at}
+        ticket["comments"] = ticket["comments"][-4:] + [comment]
+        return web.json_response(comment, status=201)
+
+    app = web.Application()
+    app.router.add_get("/api/tickets", list_tickets)
+    app.router.add_get("/api/tickets/{ticket_id}", get_ticket)
+    app.router.add_post("/api/tickets/{ticket_id}/comments", add_comment)
+    return app
+
+
+def serve_in_thread(app):
+    """Run app on a free localhost port on a background thread; returns its base URL"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    started = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return f"http://127.0.0.1:{port}/api"
+
+
+async def run_calls(client, calls, concurrency, tickets):
+    """Call the tools `calls` times across `concurrency` callers; returns ({tool: [ms]}, elapsed seconds)"""
+    latencies = {"list_tickets": [], "get_ticket": [], "add_comment": []}
+    plan = [random.choice(list(latencies)) for _ in range(calls)]
+
+    async def caller():
+        while plan:
+            tool = plan.pop()
+            args = {"limit": 20} if tool == "list_tickets" else {"ticket_id": random.randint(1, tickets)}
+            if tool == "add_comment":
+                args.update(author="bench", message="Stand-in comment")
+            start = time.perf_counter()
+            result = await client.call_tool(tool, args)
+            latencies[tool].append((time.perf_counter() - start) * 1000)
+            if "error" in result.data:
+                raise RuntimeError(f"{tool} failed: {result.data['error']}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*[caller() for _ in range(concurrency)])
+    return latencies, time.perf_counter() - start
+
+
+def per_call_request(base_url):
+    """api_request as the tools made it before: a blocking requests call on a new connection"""
+    async def api_request(method, path, **kwargs):
+        return requests.request(method, f"{base_url}{path}", **kwargs)
+    return api_request
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Tool-call latency of the ticket MCP server against a stand-in API")
+    parser.add_argument("--calls", type=int, default=300, help="Tool calls per run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent MCP callers")
+    parser.add_argument("--api-latency", type=float, default=5, help="Milliseconds the stand-in API waits per request")
+    parser.add_argument("--tickets", type=int, default=200, help="Tickets in the stand-in API")
+    args = parser.parse_args()
+
+    base_url = serve_in_thread(stand_in_api(args.tickets, args.api_latency / 1000))
+    os.environ["TICKETS_API_URL"] = base_url
+    os.environ["TICKETS_CACHE"] = "0"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import ticket_mcp_server as server
+    from fastmcp import Client
+    pooled_request = server.api_request
+
+    print(f"stand-in API at {base_url}, {args.api_latency:g}ms per request; "
+          f"{args.calls} calls from {args.concurrency} callers per run\n")
+    for mode, api_request in (("per-call", per_call_request(base_url)), ("pooled", pooled_request)):
+        server.api_request = api_request
+        async with Client(server.mcp) as client:
+            # Warm up, which for the pooled client opens its connections
+            await run_calls(client, args.concurrency, args.concurrency, args.tickets)
+            latencies, elapsed = await run_calls(client, args.calls, args.concurrency, args.tickets)
+        every = [ms for samples in latencies.values() for ms in samples]
+        print(f"{mode:<9} {args.calls / elapsed:7.1f} calls/s  p50={percentile(every, 50):6.1f}ms  "
+              f"p99={percentile(every, 99):6.1f}ms")
+        for tool, samples in latencies.items():
+            print(f"  {tool:<13} calls={len(samples):<4} p50={percentile(samples, 50):6.1f}ms  "
+                  f"p99={percentile(samples, 99):6.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,12 +1,18 @@
 #!/usr/bin/env python3
 """BeanBotics Ticketing System - Flask-OpenAPI3 App with Automatic API Documentation"""
+import os
 from flask import render_template, request, redirect, url_for
 from flask_openapi3 import OpenAPI, Info
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from pydantic import BaseModel, Field
 from typing import List, Optional
+from datetime import datetime
 from enum import Enum
-from database import db, init_db, create_ticket, get_all_tickets, get_ticket, add_comment, delete_ticket, seed_database
+from database import (db, init_db, configure_engine, create_ticket, create_tickets_bulk, get_ticket,
+                      get_ticket_header, get_ticket_version, get_tickets_page, check_page_args, search_tickets, count_tickets, add_comment, add_comments_bulk,
+                      delete_ticket, seed_database, log_event, get_events_after, TICKET_COLUMNS)
+from events import EventBus, SubscriptionRegistry, normalize_filters, slim_ticket
+from cache import ResponseCache
 
 # OpenAPI Info
 info = Info(title="BeanBotics Ticketing API", version="1.0.0", description="Real-time ticketing system for BeanBotics robotic coffee machines")
@@ -15,10 +21,52 @@ app = OpenAPI(__name__, info=info)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tickets.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'beanbotics-ticketing-secret-key'
+app.config['TICKETS_PAGE_SIZE'] = 50
+# SQLite connection profile from database.SQLITE_PROFILES ('tuned' or 'default');
+# set SQLITE_PRAGMAS to a dict to override individual PRAGMAs
+app.config['SQLITE_PROFILE'] = os.environ.get('TICKETS_SQLITE_PROFILE', 'tuned')
+# Seconds the event bus waits to coalesce Socket.IO events before broadcasting
+app.config['EVENT_COALESCE_WINDOW'] = 0.05
+# 'threading' for the dev server (python app.py); serve.py switches this to 'gevent'
+app.config['SOCKETIO_ASYNC_MODE'] = os.environ.get('TICKETS_ASYNC_MODE', 'threading')
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get('TICKETS_DB_POOL_SIZE', 5)),
+    'max_overflow': 10
+}
+# Events kept in the catch-up log (GET /api/events); older ones are pruned
+app.config['EVENT_LOG_MAX_ROWS'] = 100000
 
 # Initialize extensions
 db.init_app(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+configure_engine(app)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=app.config['SOCKETIO_ASYNC_MODE'])
+subscriptions = SubscriptionRegistry()
+event_bus = EventBus(socketio, subscriptions=subscriptions, window=app.config['EVENT_COALESCE_WINDOW'])
+response_cache = ResponseCache()
+
+def record_event(event, payload):
+    # Runs first so the broadcast carries the sequence number clients resume from
+    payload['seq'] = log_event(event, payload, max_rows=app.config['EVENT_LOG_MAX_ROWS'])
+
+event_bus.add_listener(record_event)
+# Anything that notifies clients of a change also invalidates cached responses
+event_bus.add_listener(response_cache.on_event)
+
+def cached_json_response(key, etag, build):
+    """Serve key from the response cache with an ETag, answering If-None-Match with 304
+
+    build() is only called on a cache miss and returns the data to serialize.
+    """
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        body = response_cache.get(key, etag)
+        if body is None:
+            body = app.json.dumps(build())
+            response_cache.set(key, etag, body)
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response
 
 # Pydantic Models for API Documentation and Validation
 
@@ -47,9 +95,39 @@ class TicketResponse(BaseModel):
     priority: str = Field(..., description="Priority level")
     created_at: str = Field(..., description="Creation timestamp")
     comments: Optional[List[dict]] = Field([], description="Associated comments")
+    comment_count: Optional[int] = Field(None, description="Number of comments (returned instead of comments when include_comments=false)")
+
+class TicketListQuery(BaseModel):
+    include_comments: bool = Field(True, description="Return full comment bodies; set to false to return only comment_count per ticket")
+    status: Optional[str] = Field(None, description="Only return tickets with this status")
+    priority: Optional[str] = Field(None, description="Only return tickets with this priority")
+    since: Optional[datetime] = Field(None, description="Only return tickets created at or after this timestamp")
+    cursor: Optional[str] = Field(None, description="Opaque cursor from a previous response's next_cursor")
+    limit: Optional[int] = Field(None, ge=1, le=500, description="Page size; omit to return all matching tickets")
+    fields: Optional[str] = Field(None, description="Comma-separated fields to return, e.g. id,title,status,comment_count")
+
+class TicketSearchQuery(BaseModel):
+    q: str = Field(..., min_length=1, description="Words to search for in ticket titles, descriptions and comments")
+    limit: int = Field(20, ge=1, le=100, description="Maximum number of tickets to return")
+
+class TicketSearchResult(BaseModel):
+    id: int = Field(..., description="Ticket ID")
+    title: str = Field(..., description="Ticket title")
+    status: str = Field(..., description="Current status")
+    priority: str = Field(..., description="Priority level")
+    created_at: str = Field(..., description="Creation timestamp")
+    rank: float = Field(..., description="BM25 relevance score (lower is more relevant)")
+    matched_in: str = Field(..., description="Where the best match was found: ticket or comment")
+    snippet: str = Field(..., description="Excerpt around the match with terms wrapped in **")
+
+class TicketSearchResponse(BaseModel):
+    query: str = Field(..., description="The search text")
+    results: List[TicketSearchResult] = Field(..., description="Matching tickets, most relevant first")
+    count: int = Field(..., description="Number of results")
 
 class TicketListResponse(BaseModel):
     tickets: List[TicketResponse] = Field(..., description="List of tickets")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, or null on the last page")
 
 class CommentCreate(BaseModel):
     author: str = Field(..., description="Comment author name")
@@ -62,6 +140,36 @@ class CommentResponse(BaseModel):
     message: str = Field(..., description="Comment content")
     created_at: str = Field(..., description="Creation timestamp")
 
+class TicketBulkCreate(BaseModel):
+    tickets: List[TicketCreate] = Field(..., min_length=1, max_length=10000, description="Tickets to create in one transaction")
+
+class TicketBulkResponse(BaseModel):
+    tickets: List[TicketResponse] = Field(..., description="Created tickets, in request order")
+    count: int = Field(..., description="Number of tickets created")
+
+class CommentBulkCreate(BaseModel):
+    comments: List[CommentCreate] = Field(..., min_length=1, max_length=10000, description="Comments to add in one transaction")
+
+class CommentBulkResponse(BaseModel):
+    comments: List[CommentResponse] = Field(..., description="Created comments, in request order")
+    count: int = Field(..., description="Number of comments created")
+
+class EventListQuery(BaseModel):
+    after: int = Field(0, ge=0, description="Return events with a sequence number greater than this")
+    limit: int = Field(500, ge=1, le=1000, description="Maximum number of events to return")
+
+class EventResponse(BaseModel):
+    seq: int = Field(..., description="Event sequence number")
+    event: str = Field(..., description="Socket.IO event name, e.g. ticket_created")
+    payload: dict = Field(..., description="The event payload as broadcast")
+    created_at: str = Field(..., description="When the event was recorded")
+
+class EventListResponse(BaseModel):
+    events: List[EventResponse] = Field(..., description="Events after the requested sequence number, oldest first")
+    has_more: bool = Field(..., description="Whether more events follow the last one returned")
+    oldest_seq: int = Field(..., description="Oldest sequence number still in the log")
+    latest_seq: int = Field(..., description="Most recent sequence number in the log")
+
 class ErrorResponse(BaseModel):
     error: str = Field(..., description="Error message")
 
@@ -84,32 +192,42 @@ def index():
             priority=request.form.get('priority', 'medium')
         )
         # Notify WebSocket clients of new ticket
-        socketio.emit('ticket_created', {
+        event_bus.emit('ticket_created', {
             'event': 'ticket_created',
-            'ticket': ticket,
+            'ticket': slim_ticket(ticket),
             'message': f'New ticket created: {ticket["title"]}'
         })
         return redirect(url_for('index'))
     
-    tickets = get_all_tickets()
-    return render_template('index.html', tickets=tickets)
+    fields = list(TICKET_COLUMNS) + ['comment_count']
+    try:
+        tickets, next_cursor = get_tickets_page(cursor=request.args.get('cursor'),
+                                                limit=app.config['TICKETS_PAGE_SIZE'],
+                                                fields=fields)
+    except ValueError:
+        return redirect(url_for('index'))
+    return render_template('index.html', tickets=tickets, next_cursor=next_cursor, total=count_tickets())
 
 @app.route('/ticket/<int:ticket_id>', methods=['GET', 'POST'])
 def ticket_detail(ticket_id):
     if request.method == 'POST':
         # Handle form submission to add a comment
+        ticket = get_ticket_header(ticket_id)
+        if ticket is None:
+            return "Ticket not found", 404
         comment = add_comment(
             ticket_id=ticket_id,
             author=request.form['author'],
             message=request.form['message']
         )
-        ticket = get_ticket(ticket_id)
         # Notify WebSocket clients of new comment
-        socketio.emit('comment_created', {
+        event_bus.emit('comment_created', {
             'event': 'comment_created',
             'comment': comment,
             'ticket_id': ticket_id,
             'ticket_title': ticket['title'],
+            'ticket_status': ticket['status'],
+            'ticket_priority': ticket['priority'],
             'message': f'New comment on ticket #{ticket_id}: {ticket["title"]}'
         })
         return redirect(url_for('ticket_detail', ticket_id=ticket_id))
@@ -120,14 +238,53 @@ def ticket_detail(ticket_id):
     return render_template('ticket_detail.html', ticket=ticket)
 
 # API Routes with OpenAPI Documentation
-@app.get('/api/tickets', responses={200: TicketListResponse})
-def get_tickets():
-    """Get all tickets
+@app.get('/api/tickets', responses={200: TicketListResponse, 304: None, 400: ErrorResponse})
+def get_tickets(query: TicketListQuery):
+    """Get tickets
     
-    Returns a list of all tickets in the system with their current status and details.
+    Returns tickets newest first with their current status and details. Filters are
+    applied in the database; pass limit to paginate and follow next_cursor for more pages.
+    Pass include_comments=false to receive comment counts instead of full comment bodies,
+    or fields to choose exactly which fields are returned. Supports If-None-Match.
     """
-    tickets = get_all_tickets()
-    return {"tickets": tickets}
+    if query.fields:
+        fields = [f.strip() for f in query.fields.split(',') if f.strip()]
+    else:
+        fields = list(TICKET_COLUMNS) + ['comments' if query.include_comments else 'comment_count']
+
+    def build():
+        tickets, next_cursor = get_tickets_page(
+            status=query.status,
+            priority=query.priority,
+            since=query.since,
+            cursor=query.cursor,
+            limit=query.limit,
+            fields=fields
+        )
+        return {"tickets": tickets, "next_cursor": next_cursor}
+
+    key = ('tickets', tuple(sorted(request.args.items(multi=True))))
+    try:
+        # Before the ETag check, so a bad query gets 400 rather than 304
+        check_page_args(cursor=query.cursor, fields=fields)
+        return cached_json_response(key, response_cache.list_etag(), build)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+@app.get('/api/tickets/search', responses={200: TicketSearchResponse, 304: None})
+def search_tickets_api(query: TicketSearchQuery):
+    """Search tickets and comments
+    
+    Full-text search (SQLite FTS5, BM25 ranking) across ticket titles, descriptions and
+    comments. Returns matching tickets with a snippet of the best match, so agents can
+    find relevant tickets without downloading them all. Supports If-None-Match.
+    """
+    def build():
+        results = search_tickets(query.q, limit=query.limit)
+        return {"query": query.q, "results": results, "count": len(results)}
+
+    key = ('tickets', 'search', query.q, query.limit)
+    return cached_json_response(key, response_cache.list_etag(), build)
 
 @app.post('/api/tickets', responses={201: TicketResponse, 400: ErrorResponse})
 def create_ticket_api(body: TicketCreate):
@@ -144,9 +301,9 @@ def create_ticket_api(body: TicketCreate):
             priority=body.priority.value if isinstance(body.priority, Enum) else body.priority
         )
         # Notify WebSocket clients of new ticket via API
-        socketio.emit('ticket_created', {
+        event_bus.emit('ticket_created', {
             'event': 'ticket_created',
-            'ticket': ticket,
+            'ticket': slim_ticket(ticket),
             'source': 'api',
             'message': f'New ticket created via API: {ticket["title"]}'
         })
@@ -154,16 +311,47 @@ def create_ticket_api(body: TicketCreate):
     except Exception as e:
         return {"error": str(e)}, 400
 
-@app.get('/api/tickets/<int:ticket_id>', responses={200: TicketResponse, 404: ErrorResponse})
+@app.post('/api/tickets/bulk', responses={201: TicketBulkResponse, 400: ErrorResponse})
+def create_tickets_bulk_api(body: TicketBulkCreate):
+    """Create many support tickets at once
+    
+    Inserts all tickets in a single transaction, for field units replaying tickets
+    queued while offline. Connected WebSocket clients receive one tickets_created event
+    for the whole batch rather than one ticket_created event per ticket.
+    """
+    try:
+        tickets = create_tickets_bulk([{
+            'title': t.title,
+            'description': t.description,
+            'status': t.status.value if isinstance(t.status, Enum) else t.status,
+            'priority': t.priority.value if isinstance(t.priority, Enum) else t.priority
+        } for t in body.tickets])
+        # Notify WebSocket clients of the whole batch at once
+        event_bus.emit('tickets_created', {
+            'event': 'tickets_created',
+            'tickets': [slim_ticket(t) for t in tickets],
+            'count': len(tickets),
+            'source': 'api',
+            'message': f'{len(tickets)} tickets created via bulk API'
+        })
+        return {"tickets": tickets, "count": len(tickets)}, 201
+    except Exception as e:
+        db.session.rollback()
+        return {"error": str(e)}, 400
+
+@app.get('/api/tickets/<int:ticket_id>', responses={200: TicketResponse, 304: None, 404: ErrorResponse})
 def get_ticket_api(path: TicketPathParam):
     """Get a specific ticket by ID
     
     Retrieves detailed information about a single ticket including all associated comments.
+    Responses carry an ETag; send it back as If-None-Match to get 304 while the ticket
+    is unchanged.
     """
-    ticket = get_ticket(path.ticket_id)
-    if not ticket:
+    version = get_ticket_version(path.ticket_id)
+    if not version:
         return {'error': 'Ticket not found'}, 404
-    return ticket
+    etag = ResponseCache.ticket_etag(path.ticket_id, version)
+    return cached_json_response(('ticket', path.ticket_id), etag, lambda: get_ticket(path.ticket_id))
 
 @app.post('/api/tickets/<int:ticket_id>/comments', responses={201: CommentResponse, 400: ErrorResponse, 404: ErrorResponse})
 def add_comment_api(path: TicketPathParam, body: CommentCreate):
@@ -173,21 +361,23 @@ def add_comment_api(path: TicketPathParam, body: CommentCreate):
     event to connected WebSocket clients about the new comment.
     """
     try:
+        ticket = get_ticket_header(path.ticket_id)
+        if ticket is None:
+            return {'error': 'Ticket not found'}, 404
         comment = add_comment(
             ticket_id=path.ticket_id,
             author=body.author,
             message=body.message
         )
-        ticket = get_ticket(path.ticket_id)
-        if not ticket:
-            return {'error': 'Ticket not found'}, 404
             
         # Notify WebSocket clients of new comment via API
-        socketio.emit('comment_created', {
+        event_bus.emit('comment_created', {
             'event': 'comment_created',
             'comment': comment,
             'ticket_id': path.ticket_id,
             'ticket_title': ticket['title'],
+            'ticket_status': ticket['status'],
+            'ticket_priority': ticket['priority'],
             'source': 'api',
             'message': f'New comment via API on ticket #{path.ticket_id}: {ticket["title"]}'
         })
@@ -195,40 +385,110 @@ def add_comment_api(path: TicketPathParam, body: CommentCreate):
     except Exception as e:
         return {"error": str(e)}, 400
 
+@app.post('/api/tickets/<int:ticket_id>/comments/bulk', responses={201: CommentBulkResponse, 400: ErrorResponse, 404: ErrorResponse})
+def add_comments_bulk_api(path: TicketPathParam, body: CommentBulkCreate):
+    """Add many comments to an existing ticket at once
+    
+    Inserts all comments in a single transaction. Connected WebSocket clients receive
+    one comments_created event for the whole batch.
+    """
+    try:
+        comments = add_comments_bulk(path.ticket_id, [
+            {'author': c.author, 'message': c.message} for c in body.comments
+        ])
+        if comments is None:
+            return {'error': 'Ticket not found'}, 404
+        ticket = get_ticket_header(path.ticket_id)
+        # Notify WebSocket clients of the whole batch at once
+        event_bus.emit('comments_created', {
+            'event': 'comments_created',
+            'comments': comments,
+            'count': len(comments),
+            'ticket_id': path.ticket_id,
+            'ticket_title': ticket['title'],
+            'ticket_status': ticket['status'],
+            'ticket_priority': ticket['priority'],
+            'source': 'api',
+            'message': f'{len(comments)} comments added via bulk API on ticket #{path.ticket_id}: {ticket["title"]}'
+        })
+        return {"comments": comments, "count": len(comments)}, 201
+    except Exception as e:
+        db.session.rollback()
+        return {"error": str(e)}, 400
+
 @app.route('/ticket/<int:ticket_id>/delete', methods=['POST'])
 def delete_ticket_route(ticket_id):
-    ticket = get_ticket(ticket_id)  # Get ticket info before deletion
-    if ticket and delete_ticket(ticket_id):
+    ticket = get_ticket_header(ticket_id)  # Get ticket info before deletion
+    if ticket is not None and delete_ticket(ticket_id):
         # Notify WebSocket clients of ticket deletion
-        socketio.emit('ticket_deleted', {
+        event_bus.emit('ticket_deleted', {
             'event': 'ticket_deleted',
             'ticket_id': ticket_id,
             'ticket_title': ticket['title'],
+            'ticket_status': ticket['status'],
+            'ticket_priority': ticket['priority'],
             'message': f'Ticket deleted: #{ticket_id} - {ticket["title"]}'
         })
         return redirect(url_for('index'))
     return "Ticket not found", 404
 
+@app.get('/api/metrics/subscriptions')
+def get_subscription_metrics():
+    """Get Socket.IO subscription metrics
+    
+    Lists connected clients with their subscription filters and how many events each
+    has been sent.
+    """
+    return subscriptions.stats()
+
+@app.get('/api/events', responses={200: EventListResponse})
+def get_events(query: EventListQuery):
+    """Get ticketing events after a sequence number
+    
+    Every Socket.IO event is logged with a sequence number (the `seq` field of the
+    event payload). Clients that were disconnected page through this with after=<last
+    seq they handled> to catch up; if oldest_seq > after + 1, older events were pruned.
+    """
+    events, has_more, oldest_seq, latest_seq = get_events_after(query.after, query.limit)
+    return {"events": events, "has_more": has_more, "oldest_seq": oldest_seq, "latest_seq": latest_seq}
+
 @app.route('/seed', methods=['POST'])
 def seed_route():
-    # Pass socketio to seed_database so it can emit events for each ticket/comment
-    seed_database(socketio)
+    # Pass the event bus to seed_database so it can emit events for each ticket/comment
+    seed_database(event_bus)
     return redirect(url_for('index'))
 
 # WebSocket event handlers
 @socketio.on('connect')
 def handle_connect():
     print(f'Agent connected: {request.sid}')
+    # Until a client subscribes with filters it receives every event
+    _, room = subscriptions.subscribe(request.sid, normalize_filters(None))
+    join_room(room)
     emit('connected', {'message': 'Connected to BeanBotics Ticketing System'})
 
 @socketio.on('disconnect')
 def handle_disconnect():
     print(f'Agent disconnected: {request.sid}')
+    subscriptions.unsubscribe(request.sid)
 
 @socketio.on('subscribe_to_tickets')
-def handle_subscribe():
-    """Allow agents to subscribe to ticket updates"""
-    emit('subscribed', {'message': 'Subscribed to ticket updates'})
+def handle_subscribe(data=None):
+    """Allow agents to subscribe to ticket updates
+
+    Optional filters: {"priorities": [...], "statuses": [...], "ticket_ids": [...],
+    "exclude_authors": [...]}. Subscribing again replaces the previous filters.
+    """
+    try:
+        filters = normalize_filters(data)
+    except (TypeError, ValueError, AttributeError) as e:
+        emit('subscribed', {'error': f'Invalid subscription filters: {e}'})
+        return
+    old_room, room = subscriptions.subscribe(request.sid, filters)
+    if old_room and old_room != room:
+        leave_room(old_room)
+    join_room(room)
+    emit('subscribed', {'message': 'Subscribed to ticket updates', 'filters': filters})
 
 if __name__ == '__main__':
     socketio.run(app, debug=True, port=5000, host='0.0.0.0')
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""In-process cache of serialized ticket API responses
+
+Single tickets are cached per ticket id together with the ETag they were
+built for; the ETag comes from the ticket's revision in the database, so a
+stale entry is never served even if an invalidation is missed. Ticket
+listings are cached per query string under a generation counter that is
+bumped by every ticketing event.
+
+The cache listens to the same EventBus the Socket.IO broadcasts go through, so
+whatever notifies clients of a change also invalidates the cached responses.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """LRU cache of (etag, body) pairs, invalidated by ticketing events"""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.generation = 0
+        # Distinguishes this process's list ETags from a previous run's
+        self._boot_id = uuid.uuid4().hex[:8]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def ticket_etag(ticket_id, version):
+        created_at, revision = version
+        return f"ticket-{ticket_id}-{created_at.timestamp():.6f}-{revision}"
+
+    def list_etag(self):
+        return f"tickets-{self._boot_id}-{self.generation}"
+
+    def get(self, key, etag):
+        """Return the cached body for key if it was built for etag"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, etag, body):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def on_event(self, event, payload):
+        """EventBus listener: drop entries affected by a ticketing event"""
+        ticket_ids = set()
+        if 'ticket_id' in payload:
+            ticket_ids.add(payload['ticket_id'])
+        if 'ticket' in payload:
+            ticket_ids.add(payload['ticket']['id'])
+        ticket_ids.update(t['id'] for t in payload.get('tickets', []))
+        with self._lock:
+            self.generation += 1
+            if event == 'tickets_reset':
+                self._entries.clear()
+                return
+            for ticket_id in ticket_ids:
+                self._entries.pop(('ticket', ticket_id), None)
+            for key in [k for k in self._entries if k[0] == 'tickets']:
+                del self._entries[key]
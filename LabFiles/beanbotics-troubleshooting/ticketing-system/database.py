@@ -1,39 +1,93 @@
 #!/usr/bin/env python3
 """Database models for ticketing system using SQLAlchemy"""
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload, subqueryload, load_only
+from datetime import datetime, timezone
+import base64
+import json
+import re
 
 db = SQLAlchemy()
 
+# PRAGMAs applied to every new SQLite connection, selected by app.config['SQLITE_PROFILE'].
+# 'tuned' uses WAL so agent writes don't block dashboard/API readers.
+SQLITE_PROFILES = {
+    'default': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+    },
+    'tuned': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',   # safe with WAL; only the last commits may roll back on power loss
+        'busy_timeout': 5000,      # ms to wait on a locked database before raising
+        'mmap_size': 268435456,    # 256 MB memory-mapped reads
+        'cache_size': -65536,      # negative = KiB, so 64 MB page cache per connection
+        'temp_store': 'MEMORY',
+    },
+}
+
+def configure_engine(app):
+    """Apply the app's SQLite PRAGMA profile to every connection the engine opens
+
+    Uses app.config['SQLITE_PROFILE'] (a key of SQLITE_PROFILES), with
+    individual values overridable through app.config['SQLITE_PRAGMAS'].
+    Must be called after db.init_app(app) and before the first query.
+    """
+    pragmas = {**SQLITE_PROFILES[app.config.get('SQLITE_PROFILE', 'tuned')],
+               **app.config.get('SQLITE_PRAGMAS', {})}
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
 class Ticket(db.Model):
     __tablename__ = 'tickets'
+    __table_args__ = (
+        db.Index('ix_tickets_status_priority_created_at', 'status', 'priority', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     status = db.Column(db.String(50), default='open')
     priority = db.Column(db.String(50), default='medium')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Bumped whenever the ticket or its comments change; used for ETags
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
     # Relationship with cascade delete
     comments = db.relationship('Comment', backref='ticket', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_comments=True, comment_count=None):
+        data = {
             'id': self.id,
             'title': self.title,
             'description': self.description,
             'status': self.status,
             'priority': self.priority,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'comments': [comment.to_dict() for comment in self.comments]
+            'revision': self.revision,
         }
+        if include_comments:
+            data['comments'] = [comment.to_dict() for comment in self.comments]
+        else:
+            # Callers that already aggregated the count pass it in to avoid touching self.comments
+            data['comment_count'] = comment_count if comment_count is not None else len(self.comments)
+        return data
 
 class Comment(db.Model):
     __tablename__ = 'comments'
     
     id = db.Column(db.Integer, primary_key=True)
-    ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False, index=True)
     author = db.Column(db.String(100), nullable=False)
     message = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -47,9 +101,109 @@ class Comment(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class Event(db.Model):
+    """Every ticketing event broadcast over Socket.IO, numbered so clients can resume after a gap"""
+    __tablename__ = 'events'
+    # AUTOINCREMENT so pruned sequence numbers are never handed out again
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    seq = db.Column(db.Integer, primary_key=True)
+    event = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'event': self.event,
+            'payload': json.loads(self.payload),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+def _add_column(table, column, ddl):
+    """Migration step that adds a column unless create_all() already created it"""
+    def step(conn):
+        existing = [row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info({table})')]
+        if column not in existing:
+            conn.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+    return step
+
+# Versioned schema migrations, tracked in SQLite's PRAGMA user_version.
+# Fresh databases get these objects from the model definitions via create_all();
+# the migrations bring existing tickets.db files up to date, so every step
+# must be idempotent. Steps are SQL strings or callables taking the connection.
+# Objects that can't be declared on the models (FTS5 tables, triggers) only
+# exist here. Append new entries with the next version number.
+MIGRATIONS = [
+    (1, 'Index comments by ticket and tickets by listing order', [
+        'CREATE INDEX IF NOT EXISTS ix_comments_ticket_id ON comments (ticket_id)',
+        'CREATE INDEX IF NOT EXISTS ix_tickets_created_at ON tickets (created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_tickets_status_priority_created_at ON tickets (status, priority, created_at)',
+    ]),
+    (2, 'Add tickets.revision for conditional GETs', [
+        _add_column('tickets', 'revision', 'INTEGER NOT NULL DEFAULT 1'),
+    ]),
+    (3, 'Full-text search over tickets and comments', [
+        # External-content FTS5 indexes: text stays in tickets/comments, triggers keep the index in sync
+        "CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5("
+        "title, description, content='tickets', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5("
+        "message, content='comments', content_rowid='id', tokenize='porter unicode61')",
+        """CREATE TRIGGER IF NOT EXISTS tickets_fts_ai AFTER INSERT ON tickets BEGIN
+            INSERT INTO tickets_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS tickets_fts_ad AFTER DELETE ON tickets BEGIN
+            INSERT INTO tickets_fts(tickets_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS tickets_fts_au AFTER UPDATE OF title, description ON tickets BEGIN
+            INSERT INTO tickets_fts(tickets_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO tickets_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS comments_fts_ai AFTER INSERT ON comments BEGIN
+            INSERT INTO comments_fts(rowid, message) VALUES (new.id, new.message);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS comments_fts_ad AFTER DELETE ON comments BEGIN
+            INSERT INTO comments_fts(comments_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS comments_fts_au AFTER UPDATE OF message ON comments BEGIN
+            INSERT INTO comments_fts(comments_fts, rowid, message) VALUES ('delete', old.id, old.message);
+            INSERT INTO comments_fts(rowid, message) VALUES (new.id, new.message);
+        END""",
+        # Index rows that existed before the triggers
+        "INSERT INTO tickets_fts(tickets_fts) VALUES ('rebuild')",
+        "INSERT INTO comments_fts(comments_fts) VALUES ('rebuild')",
+    ]),
+    (4, 'Event log for Socket.IO catch-up', [
+        """CREATE TABLE IF NOT EXISTS events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            event VARCHAR(50) NOT NULL,
+            payload TEXT NOT NULL,
+            created_at DATETIME
+        )""",
+    ]),
+]
+
+def run_migrations():
+    """Apply any migrations newer than the database's recorded schema version"""
+    with db.engine.begin() as conn:
+        current_version = conn.exec_driver_sql('PRAGMA user_version').scalar()
+        for version, description, statements in MIGRATIONS:
+            if version <= current_version:
+                continue
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.exec_driver_sql(statement)
+            conn.exec_driver_sql(f'PRAGMA user_version = {version}')
+            print(f'Applied migration {version}: {description}')
+
 def init_db():
-    """Initialize database tables"""
+    """Initialize database tables and apply pending schema migrations"""
     db.create_all()
+    run_migrations()
 
 def create_ticket(title, description='', status='open', priority='medium'):
     """Create a new ticket"""
@@ -61,12 +215,195 @@ def create_ticket(title, description='', status='open', priority='medium'):
     )
     db.session.add(ticket)
     db.session.commit()
-    return ticket.to_dict()
+    # A new ticket has no comments, so skip the lazy comments load
+    return {**_ticket_fields(ticket, TICKET_COLUMNS, {}), 'comments': []}
+
+def create_tickets_bulk(tickets):
+    """Create many tickets in one transaction
+
+    tickets is a list of dicts with title, description, status and priority.
+    Rows are sent as multi-row INSERT ... RETURNING statements of up to 1000
+    rows each, and the response is built from the returned rows, so 200
+    tickets cost one INSERT and one commit with no follow-up SELECTs.
+    """
+    if not tickets:
+        return []
+    rows = [{
+        'title': t['title'],
+        'description': t.get('description', ''),
+        'status': t.get('status', 'open'),
+        'priority': t.get('priority', 'medium')
+    } for t in tickets]
+    created = db.session.execute(
+        db.insert(Ticket.__table__).returning(*[Ticket.__table__.c[name] for name in TICKET_COLUMNS]), rows
+    ).mappings().all()
+    db.session.commit()
+    return [_returned_row(row, comments=[]) for row in _in_insert_order(created)]
+
+TICKET_COLUMNS = ('id', 'title', 'description', 'status', 'priority', 'created_at', 'revision')
+TICKET_FIELDS = TICKET_COLUMNS + ('comments', 'comment_count')
+COMMENT_COLUMNS = ('id', 'ticket_id', 'author', 'message', 'created_at')
+
+def _in_insert_order(rows):
+    """Order bulk INSERT ... RETURNING rows like the input rows
+
+    SQLite returns them in no guaranteed order, and without a sentinel column
+    SQLAlchemy can only guarantee the order (sort_by_parameter_order) by
+    sending one INSERT per row. Each new row gets a higher rowid than the
+    one before it, so sorting by id restores the input order.
+    """
+    return sorted(rows, key=lambda row: row['id'])
+
+def _returned_row(row, **extra):
+    """Serialize a RETURNING row the way the models' to_dict() would"""
+    data = dict(row)
+    data['created_at'] = data['created_at'].isoformat() if data['created_at'] else None
+    return {**data, **extra}
+
+def encode_cursor(ticket):
+    """Encode a ticket's (created_at, id) sort key as an opaque pagination cursor"""
+    raw = f"{ticket.created_at.isoformat()}|{ticket.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """Decode a pagination cursor back into (created_at, id); raises ValueError if malformed"""
+    try:
+        created_at, ticket_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(ticket_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
-def get_all_tickets():
-    """Get all tickets ordered by creation date"""
-    tickets = Ticket.query.order_by(Ticket.created_at.desc()).all()
-    return [ticket.to_dict() for ticket in tickets]
+def _ticket_fields(ticket, fields, comment_counts):
+    """Serialize only the requested fields so unloaded columns are never touched"""
+    data = {}
+    for field in fields:
+        if field == 'comments':
+            data['comments'] = [comment.to_dict() for comment in ticket.comments]
+        elif field == 'comment_count':
+            data['comment_count'] = comment_counts.get(ticket.id, 0)
+        elif field == 'created_at':
+            data['created_at'] = ticket.created_at.isoformat() if ticket.created_at else None
+        else:
+            data[field] = getattr(ticket, field)
+    return data
+
+def check_page_args(cursor=None, fields=None):
+    """Raise ValueError for the cursor or fields get_tickets_page would reject"""
+    unknown = [f for f in fields or () if f not in TICKET_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if cursor:
+        decode_cursor(cursor)
+
+def get_tickets_page(status=None, priority=None, since=None, cursor=None, limit=None, fields=None):
+    """Get one page of tickets, newest first, filtered and projected in SQL
+
+    Pagination is keyset-based on (created_at, id): pass the returned
+    next_cursor back as cursor to fetch the following page. Only the columns
+    named in fields are loaded. Returns a (tickets, next_cursor) tuple;
+    next_cursor is None on the last page.
+    """
+    fields = list(fields) if fields else list(TICKET_FIELDS[:-1])
+    check_page_args(fields=fields)
+
+    # id and created_at are always loaded since the cursor is built from them
+    columns = {'id', 'created_at'} | {f for f in fields if f in TICKET_COLUMNS}
+    query = Ticket.query.options(load_only(*[getattr(Ticket, c) for c in columns]))
+    if 'comments' in fields:
+        # A page is at most one SELECT ... IN by primary key; an unpaged listing
+        # loads every comment in one query instead of one per 500 tickets
+        query = query.options(selectinload(Ticket.comments) if limit else subqueryload(Ticket.comments))
+
+    if status:
+        query = query.filter(Ticket.status == status)
+    if priority:
+        query = query.filter(Ticket.priority == priority)
+    if since:
+        if since.tzinfo:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        query = query.filter(Ticket.created_at >= since)
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.filter(db.or_(
+            Ticket.created_at < cursor_created_at,
+            db.and_(Ticket.created_at == cursor_created_at, Ticket.id < cursor_id)
+        ))
+
+    query = query.order_by(Ticket.created_at.desc(), Ticket.id.desc())
+    if limit:
+        query = query.limit(limit + 1)
+    tickets = query.all()
+
+    next_cursor = None
+    if limit and len(tickets) > limit:
+        tickets = tickets[:limit]
+        next_cursor = encode_cursor(tickets[-1])
+
+    comment_counts = {}
+    if 'comment_count' in fields and tickets:
+        count_query = (db.session.query(Comment.ticket_id, db.func.count(Comment.id))
+                       .group_by(Comment.ticket_id))
+        if limit:
+            count_query = count_query.filter(Comment.ticket_id.in_([t.id for t in tickets]))
+        comment_counts = dict(count_query.all())
+
+    return [_ticket_fields(t, fields, comment_counts) for t in tickets], next_cursor
+
+SEARCH_SQL = """
+WITH hits AS (
+    SELECT rowid AS ticket_id,
+           bm25(tickets_fts, 10.0, 1.0) AS rank,
+           'ticket' AS matched_in,
+           snippet(tickets_fts, -1, '**', '**', '...', 12) AS snippet
+    FROM tickets_fts WHERE tickets_fts MATCH :query
+    UNION ALL
+    SELECT comments.ticket_id,
+           bm25(comments_fts) AS rank,
+           'comment' AS matched_in,
+           snippet(comments_fts, 0, '**', '**', '...', 12) AS snippet
+    FROM comments_fts JOIN comments ON comments.id = comments_fts.rowid
+    WHERE comments_fts MATCH :query
+),
+best AS (
+    -- SQLite takes the bare columns from the row holding MIN(rank)
+    SELECT ticket_id, MIN(rank) AS rank, matched_in, snippet FROM hits GROUP BY ticket_id
+)
+SELECT tickets.id, tickets.title, tickets.status, tickets.priority, tickets.created_at,
+       best.rank, best.matched_in, best.snippet
+FROM best JOIN tickets ON tickets.id = best.ticket_id
+ORDER BY best.rank
+LIMIT :limit
+"""
+
+def _fts_query(text):
+    """Turn free text into an FTS5 query that ANDs each word, so user input can't break MATCH syntax"""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"' for word in words)
+
+def search_tickets(text, limit=20):
+    """Full-text search over ticket titles, descriptions and comments
+
+    Returns the best-ranked tickets (most relevant first), each with a
+    snippet of the best match and whether it was in the ticket or a comment.
+    """
+    query = _fts_query(text)
+    if not query:
+        return []
+    rows = db.session.execute(db.text(SEARCH_SQL), {'query': query, 'limit': limit}).mappings()
+    return [{
+        'id': row['id'],
+        'title': row['title'],
+        'status': row['status'],
+        'priority': row['priority'],
+        'created_at': datetime.fromisoformat(row['created_at']).isoformat() if row['created_at'] else None,
+        'rank': row['rank'],
+        'matched_in': row['matched_in'],
+        'snippet': row['snippet']
+    } for row in rows]
+
+def count_tickets():
+    """Get the total number of tickets"""
+    return Ticket.query.count()
 
 def get_ticket(ticket_id):
     """Get a specific ticket with its comments"""
@@ -75,6 +412,20 @@ def get_ticket(ticket_id):
         return None
     return ticket.to_dict()
 
+def get_ticket_header(ticket_id):
+    """Get a ticket's id, title, status and priority without loading comments, or None if it does not exist"""
+    row = (db.session.query(Ticket.id, Ticket.title, Ticket.status, Ticket.priority)
+           .filter_by(id=ticket_id).first())
+    return dict(row._mapping) if row else None
+
+def get_ticket_version(ticket_id):
+    """Get the (created_at, revision) pair identifying a ticket's current state, or None"""
+    row = db.session.query(Ticket.created_at, Ticket.revision).filter_by(id=ticket_id).first()
+    return tuple(row) if row else None
+
+def _bump_revision(ticket_id):
+    Ticket.query.filter_by(id=ticket_id).update({Ticket.revision: Ticket.revision + 1})
+
 def add_comment(ticket_id, author, message):
     """Add a comment to a ticket"""
     comment = Comment(
@@ -83,9 +434,30 @@ def add_comment(ticket_id, author, message):
         message=message
     )
     db.session.add(comment)
+    _bump_revision(ticket_id)
     db.session.commit()
     return comment.to_dict()
 
+def add_comments_bulk(ticket_id, comments):
+    """Add many comments to a ticket in one transaction
+
+    comments is a list of dicts with author and message. Returns None if the
+    ticket does not exist. Like create_tickets_bulk, the rows go out as
+    batched INSERT ... RETURNING and are serialized from the returned rows,
+    so a batch costs the ticket check, the INSERT and the revision bump.
+    """
+    if get_ticket_header(ticket_id) is None:
+        return None
+    if not comments:
+        return []
+    rows = [{'ticket_id': ticket_id, 'author': c['author'], 'message': c['message']} for c in comments]
+    created = db.session.execute(
+        db.insert(Comment.__table__).returning(*[Comment.__table__.c[name] for name in COMMENT_COLUMNS]), rows
+    ).mappings().all()
+    _bump_revision(ticket_id)
+    db.session.commit()
+    return [_returned_row(row) for row in _in_insert_order(created)]
+
 def delete_ticket(ticket_id):
     """Delete a ticket and all its comments"""
     ticket = Ticket.query.get(ticket_id)
@@ -95,6 +467,36 @@ def delete_ticket(ticket_id):
     db.session.commit()
     return True
 
+def log_event(event, payload, max_rows=None):
+    """Append an event to the event log and return its sequence number
+
+    With max_rows set, every 1000th event prunes the log down to the newest
+    max_rows entries.
+    """
+    entry = Event(event=event, payload=json.dumps(payload))
+    db.session.add(entry)
+    db.session.commit()
+    if max_rows and entry.seq % 1000 == 0:
+        Event.query.filter(Event.seq <= entry.seq - max_rows).delete(synchronize_session=False)
+        db.session.commit()
+    return entry.seq
+
+def get_events_after(after=0, limit=500):
+    """Events with seq > after, oldest first
+
+    Returns (events, has_more, oldest_seq, latest_seq); oldest_seq shows
+    whether the log was pruned past `after`.
+    """
+    events = (Event.query.filter(Event.seq > after)
+              .order_by(Event.seq)
+              .limit(limit + 1)
+              .all())
+    # Separate subqueries: SQLite only answers a lone min() or max() from the index,
+    # and scans the whole log for both in one SELECT
+    oldest_seq, latest_seq = db.session.query(db.select(db.func.min(Event.seq)).scalar_subquery(),
+                                              db.select(db.func.max(Event.seq)).scalar_subquery()).one()
+    return [e.to_dict() for e in events[:limit]], len(events) > limit, oldest_seq or 0, latest_seq or 0
+
 def seed_database(socketio=None):
     """Add one random BeanBotics support ticket to the database"""
     import random
@@ -160,9 +562,16 @@ def seed_database(socketio=None):
     
     # Emit WebSocket event for the ticket created during seeding
     if socketio:
+        # Every earlier ticket is gone and ids start again from 1, so clients
+        # holding tickets must drop or reload them rather than wait for deletions
+        socketio.emit('tickets_reset', {
+            'event': 'tickets_reset',
+            'source': 'seed',
+            'message': 'All tickets were deleted by seeding'
+        })
         socketio.emit('ticket_created', {
             'event': 'ticket_created',
-            'ticket': ticket.to_dict(),
+            'ticket': ticket.to_dict(include_comments=False, comment_count=0),
             'source': 'seed',
             'message': f'Random sample ticket created: {ticket.title}'
         })
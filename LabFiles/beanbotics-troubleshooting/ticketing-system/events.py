@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Outbound Socket.IO event bus for the ticketing system
+
+HTTP handlers publish events here instead of calling socketio.emit() inline.
+Events are queued and flushed from a background task every `window` seconds,
+so requests return without waiting on the broadcast fan-out. Within a window:
+- several ticket_created events become one tickets_created event
+- several comment_created events on the same ticket become one comments_created event
+A merged event carries the event-log `seq` of the newest event it contains,
+and each of its tickets or comments carries the `source` of its own event.
+Nothing is merged across a tickets_reset event, which is sent when every
+ticket has been deleted (on seeding).
+
+Each connection has one subscription (a set of filters), and connections with
+identical filters share a Socket.IO room. Events are only sent to the rooms
+whose filters they match, so monitors are not woken for tickets they ignore.
+"""
+import json
+import threading
+from collections import Counter
+from database import TICKET_COLUMNS
+
+
+def slim_ticket(ticket):
+    """Strip a ticket dict down to its columns (no comment bodies) for broadcasting"""
+    return {key: ticket[key] for key in TICKET_COLUMNS if key in ticket}
+
+
+def normalize_filters(data):
+    """Build a canonical subscription filter from a subscribe_to_tickets payload
+
+    Supported keys are priorities, statuses, ticket_ids and exclude_authors; an
+    empty or missing key means "no restriction".
+    """
+    data = data or {}
+    return {
+        'priorities': sorted({str(p).lower() for p in data.get('priorities') or []}),
+        'statuses': sorted({str(s).lower() for s in data.get('statuses') or []}),
+        'ticket_ids': sorted({int(t) for t in data.get('ticket_ids') or []}),
+        'exclude_authors': sorted({str(a) for a in data.get('exclude_authors') or []}),
+    }
+
+
+def _ticket_matches(filters, ticket_id, status, priority):
+    if filters['ticket_ids'] and ticket_id not in filters['ticket_ids']:
+        return False
+    if filters['statuses'] and (status or '').lower() not in filters['statuses']:
+        return False
+    if filters['priorities'] and (priority or '').lower() not in filters['priorities']:
+        return False
+    return True
+
+
+def filter_event(filters, event, payload):
+    """Return the payload as seen by a subscription, or None if it should not be sent"""
+    if event in ('ticket_created', 'tickets_created'):
+        tickets = payload['tickets'] if event == 'tickets_created' else [payload['ticket']]
+        matched = [t for t in tickets if _ticket_matches(filters, t['id'], t.get('status'), t.get('priority'))]
+        if not matched:
+            return None
+        if event == 'ticket_created' or len(matched) == len(tickets):
+            return payload
+        return {**payload, 'tickets': matched, 'count': len(matched)}
+
+    if event in ('comment_created', 'comments_created', 'ticket_deleted'):
+        if not _ticket_matches(filters, payload['ticket_id'],
+                               payload.get('ticket_status'), payload.get('ticket_priority')):
+            return None
+        if event == 'ticket_deleted' or not filters['exclude_authors']:
+            return payload
+        comments = payload['comments'] if event == 'comments_created' else [payload['comment']]
+        kept = [c for c in comments if c['author'] not in filters['exclude_authors']]
+        if not kept:
+            return None
+        if event == 'comment_created' or len(kept) == len(comments):
+            return payload
+        return {**payload, 'comments': kept, 'count': len(kept)}
+
+    return payload
+
+
+class SubscriptionRegistry:
+    """Tracks each connection's filters, the room they map to, and events sent per connection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filters = {}        # room -> filters
+        self._members = {}        # room -> set of sids
+        self._rooms = {}          # sid -> room
+        self.events_sent = Counter()
+
+    def subscribe(self, sid, filters):
+        """Move sid onto the room for filters; returns (old_room, new_room)"""
+        room = 'tickets:' + json.dumps(filters, sort_keys=True)
+        with self._lock:
+            old_room = self._remove(sid)
+            self._filters[room] = filters
+            self._members.setdefault(room, set()).add(sid)
+            self._rooms[sid] = room
+        return old_room, room
+
+    def unsubscribe(self, sid):
+        """Forget sid; returns the room it was in, if any"""
+        with self._lock:
+            self.events_sent.pop(sid, None)
+            return self._remove(sid)
+
+    def _remove(self, sid):
+        room = self._rooms.pop(sid, None)
+        if room:
+            self._members[room].discard(sid)
+            if not self._members[room]:
+                del self._members[room]
+                del self._filters[room]
+        return room
+
+    def route(self, event, payload):
+        """Yield (room, payload) for every room the event should be sent to"""
+        with self._lock:
+            rooms = [(room, filters, list(self._members[room])) for room, filters in self._filters.items()]
+        for room, filters, sids in rooms:
+            room_payload = filter_event(filters, event, payload)
+            if room_payload is None:
+                continue
+            with self._lock:
+                for sid in sids:
+                    self.events_sent[sid] += 1
+            yield room, room_payload
+
+    def stats(self):
+        with self._lock:
+            return {
+                'connections': [
+                    {'sid': sid, 'filters': self._filters[room], 'events_sent': self.events_sent[sid]}
+                    for sid, room in self._rooms.items()
+                ],
+                'rooms': len(self._filters),
+                'total_events_sent': sum(self.events_sent.values())
+            }
+
+
+class EventBus:
+    """Queues, coalesces and broadcasts ticketing events from a background task"""
+
+    def __init__(self, socketio, subscriptions=None, window=0.05):
+        self.socketio = socketio
+        self.subscriptions = subscriptions
+        self.window = window
+        self._pending = []
+        self._lock = threading.Lock()
+        self._task = None
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Call listener(event, payload) synchronously on every emit, before broadcasting"""
+        self._listeners.append(listener)
+
+    def emit(self, event, payload):
+        """Queue an event for the next flush; same signature as socketio.emit"""
+        for listener in self._listeners:
+            listener(event, payload)
+        with self._lock:
+            self._pending.append((event, payload))
+            if self._task is None:
+                self._task = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.window)
+            self.flush()
+
+    def flush(self):
+        """Broadcast everything queued so far, coalesced"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for event, payload in coalesce(pending):
+            if self.subscriptions is None:
+                self.socketio.emit(event, payload)
+                continue
+            for room, room_payload in self.subscriptions.route(event, payload):
+                self.socketio.emit(event, room_payload, to=room)
+
+
+def _last_seq(group):
+    """The event log sequence number a merged event resumes from"""
+    return max((payload.get('seq') or 0 for _, payload in group), default=0) or None
+
+def _tag_source(items, payload):
+    """Copy an event's source onto its tickets or comments before they are merged with others"""
+    return [item if 'source' in item else {**item, 'source': payload.get('source')} for item in items]
+
+def _common_source(group):
+    """The source shared by every merged event, or None if they differ"""
+    sources = {payload.get('source') for _, payload in group}
+    return sources.pop() if len(sources) == 1 else None
+
+def coalesce(events):
+    """Merge queued (event, payload) pairs, keeping the order each group first appeared"""
+    groups = {}
+    resets = 0  # events before a reset must not be merged into ones after it
+    for event, payload in events:
+        if event in ('ticket_created', 'tickets_created'):
+            key = ('tickets', resets)
+        elif event in ('comment_created', 'comments_created'):
+            key = ('comments', resets, payload['ticket_id'])
+        else:
+            key = ('single', len(groups))
+            if event == 'tickets_reset':
+                resets += 1
+        groups.setdefault(key, []).append((event, payload))
+
+    for key, group in groups.items():
+        if len(group) == 1:
+            yield group[0]
+        elif key[0] == 'tickets':
+            tickets = []
+            for event, payload in group:
+                tickets.extend(_tag_source(payload['tickets'] if event == 'tickets_created' else [payload['ticket']],
+                                           payload))
+            yield 'tickets_created', {
+                'event': 'tickets_created',
+                'tickets': tickets,
+                'count': len(tickets),
+                'seq': _last_seq(group),
+                'source': _common_source(group),
+                'message': f'{len(tickets)} new tickets created'
+            }
+        else:
+            comments = []
+            for event, payload in group:
+                comments.extend(_tag_source(payload['comments'] if event == 'comments_created' else [payload['comment']],
+                                            payload))
+            last = group[-1][1]
+            yield 'comments_created', {
+                'event': 'comments_created',
+                'comments': comments,
+                'count': len(comments),
+                'ticket_id': last['ticket_id'],
+                'ticket_title': last.get('ticket_title'),
+                'ticket_status': last.get('ticket_status'),
+                'ticket_priority': last.get('ticket_priority'),
+                'seq': _last_seq(group),
+                'source': _common_source(group),
+                'message': f'{len(comments)} new comments on ticket #{last["ticket_id"]}: {last.get("ticket_title")}'
+            }
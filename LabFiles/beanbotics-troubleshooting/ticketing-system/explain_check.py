@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Index check for the ticketing database's hot queries
+
+Builds a throwaway database through init_db() (so it has the same tables,
+indexes and migrations as tickets.db), fills it with tickets, comments and
+events, then runs the query functions the API calls on every request while
+recording the SQL they send. Each recorded statement is run again under
+EXPLAIN QUERY PLAN, and the check fails if any plan reads tickets, comments
+or events with a full table SCAN instead of SEARCH ... USING INDEX (or an
+index-ordered SCAN for the paged listing):
+
+    python explain_check.py --tickets 5000 --comments 3
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from flask import Flask
+from sqlalchemy import event
+from database import (db, init_db, configure_engine, Comment, create_tickets_bulk, get_tickets_page,
+                      encode_cursor, search_tickets, count_tickets, get_ticket, get_ticket_header,
+                      get_ticket_version, get_events_after, Event, Ticket)
+
+STATUSES = ['open', 'in-progress', 'closed']
+PRIORITIES = ['low', 'medium', 'high']
+# A plan step that reads a whole table: "SCAN comments", without USING ... INDEX
+FULL_SCAN = re.compile(r'SCAN (tickets|comments|events)$')
+
+
+def build(tickets, comments):
+    """Fill the database with tickets, comments per ticket and one event per ticket"""
+    batch = 1000
+    for start in range(0, tickets, batch):
+        create_tickets_bulk([{
+            'title': f'Ticket {i} grinder burr jam' if i % 50 == 0 else f'Ticket {i}',
+            'description': 'Created by explain_check.py',
+            'status': STATUSES[i % len(STATUSES)],
+            'priority': PRIORITIES[i // len(STATUSES) % len(PRIORITIES)]
+        } for i in range(start, min(start + batch, tickets))])
+    rows = [{'ticket_id': ticket_id, 'author': 'customer', 'message': f'Comment {n} on #{ticket_id}'}
+            for ticket_id in range(1, tickets + 1) for n in range(comments)]
+    for start in range(0, len(rows), batch * 10):
+        db.session.execute(db.insert(Comment), rows[start:start + batch * 10])
+    db.session.commit()
+    db.session.execute(db.insert(Event), [{'event': 'ticket_created', 'payload': json.dumps({'ticket': {'id': ticket_id}})}
+                                          for ticket_id in range(1, tickets + 1)])
+    db.session.commit()
+
+
+def hot_queries(tickets):
+    """(name, call) for the reads behind the API's per-request endpoints"""
+    first_page, _ = get_tickets_page(limit=50, fields=['id', 'created_at'])
+    middle = db.session.get(Ticket, tickets // 2)
+    cursor = encode_cursor(middle)
+    since = datetime.now(timezone.utc) - timedelta(hours=1)
+    return [
+        ('list page', lambda: get_tickets_page(limit=50)),
+        ('list next page', lambda: get_tickets_page(cursor=cursor, limit=50)),
+        ('list with comments', lambda: get_tickets_page(limit=50, fields=['id', 'title', 'comments'])),
+        ('list comment counts', lambda: get_tickets_page(limit=50, fields=['id', 'comment_count'])),
+        ('list by status+priority', lambda: get_tickets_page(status='open', priority='high', limit=50)),
+        ('list by status', lambda: get_tickets_page(status='open', limit=50)),
+        ('list since', lambda: get_tickets_page(since=since, limit=50)),
+        ('count', count_tickets),
+        ('get ticket', lambda: get_ticket(first_page[0]['id'])),
+        ('ticket header', lambda: get_ticket_header(first_page[0]['id'])),
+        ('ticket version', lambda: get_ticket_version(first_page[0]['id'])),
+        ('search', lambda: search_tickets('grinder jam')),
+        ('events after', lambda: get_events_after(tickets - 100, limit=50)),
+    ]
+
+
+def check(name, call):
+    """Run call, print the plan of every SELECT it sends and return how many scan a whole table"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        call()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    db.session.rollback()
+
+    failures = 0
+    with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            plan = [row[3] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+            scans = [step for step in plan if FULL_SCAN.match(step)]
+            failures += bool(scans)
+            print(f"{'FAIL' if scans else 'ok':<5} {name}")
+            for step in plan:
+                print(f"        {step}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the ticketing hot queries use indexes")
+    parser.add_argument("--tickets", type=int, default=5000, help="Tickets to create")
+    parser.add_argument("--comments", type=int, default=3, help="Comments per ticket")
+    parser.add_argument("--profile", default="tuned", help="SQLite profile (see database.SQLITE_PROFILES)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='explain-check-') as directory:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'tickets.db')}"
+        app.config['SQLITE_PROFILE'] = args.profile
+        db.init_app(app)
+        configure_engine(app)
+
+        failures = 0
+        with app.app_context():
+            init_db()
+            build(args.tickets, args.comments)
+            print(f"built {args.tickets} tickets, {args.tickets * args.comments} comments")
+
+            for name, call in hot_queries(args.tickets):
+                failures += check(name, call)
+
+    print(f"\n{failures} queries scan a whole table" if failures else "\nall hot queries use indexes")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
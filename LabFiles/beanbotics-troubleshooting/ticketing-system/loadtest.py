@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Load test for the BeanBotics Ticketing API
+
+Runs concurrent readers against GET /api/tickets while writers post comments to
+POST /api/tickets/<id>/comments, then reports p50/p99 latency for each.
+
+Compare SQLite profiles by starting the app with each one in turn:
+    TICKETS_SQLITE_PROFILE=default python app.py
+    TICKETS_SQLITE_PROFILE=tuned python app.py
+and running:
+    python loadtest.py --readers 16 --writers 4 --duration 15
+"""
+import argparse
+import statistics
+import threading
+import time
+import requests
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of latencies"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def worker(action, stop_at, latencies, errors):
+    """Repeat action until stop_at, recording latency in ms per call"""
+    session = requests.Session()
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        try:
+            ok = action(session)
+        except requests.RequestException:
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        if ok:
+            latencies.append(elapsed)
+        else:
+            errors.append(elapsed)
+
+
+def report(name, latencies, errors, duration):
+    print(f"{name:<8} requests={len(latencies):<6} errors={len(errors):<4} "
+          f"rps={len(latencies) / duration:7.1f}  "
+          f"p50={percentile(latencies, 50):7.1f}ms  p99={percentile(latencies, 99):7.1f}ms  "
+          f"mean={statistics.mean(latencies) if latencies else 0:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent read/write load test for the ticketing API")
+    parser.add_argument("--url", default="http://localhost:5000/api", help="API base URL")
+    parser.add_argument("--readers", type=int, default=16, help="Concurrent GET /api/tickets clients")
+    parser.add_argument("--writers", type=int, default=4, help="Concurrent comment writers")
+    parser.add_argument("--duration", type=float, default=15, help="Test duration in seconds")
+    parser.add_argument("--limit", type=int, default=50, help="Page size used by readers")
+    args = parser.parse_args()
+
+    # Writers need a ticket to comment on
+    ticket = requests.post(f"{args.url}/tickets", json={
+        "title": "Load test ticket",
+        "description": "Created by loadtest.py"
+    }).json()
+    ticket_id = ticket["id"]
+
+    def read(session):
+        return session.get(f"{args.url}/tickets", params={"limit": args.limit}).status_code == 200
+
+    def write(session):
+        response = session.post(f"{args.url}/tickets/{ticket_id}/comments",
+                                json={"author": "loadtest", "message": "load test comment"})
+        return response.status_code == 201
+
+    read_latencies, read_errors = [], []
+    write_latencies, write_errors = [], []
+    stop_at = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=worker, args=(read, stop_at, read_latencies, read_errors))
+               for _ in range(args.readers)]
+    threads += [threading.Thread(target=worker, args=(write, stop_at, write_latencies, write_errors))
+                for _ in range(args.writers)]
+
+    print(f"Running {args.readers} readers and {args.writers} writers for {args.duration:.0f}s "
+          f"against {args.url} (ticket #{ticket_id})")
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report("reads", read_latencies, read_errors, args.duration)
+    report("writes", write_latencies, write_errors, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Query-count benchmark for the ticket listing paths
+
+Grows a throwaway database (built through init_db(), like tickets.db) to each
+ticket count in turn and runs every listing path behind GET /api/tickets,
+counting the SQL statements each one sends and timing it. The batched paths
+must send the same number of statements at every size; the lazy
+Ticket.to_dict() loop they replaced is shown for comparison and grows by one
+SELECT per ticket:
+
+    python query_count_bench.py --sizes 100,1000,10000 --comments 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from flask import Flask
+from sqlalchemy import event
+from database import db, init_db, configure_engine, Comment, Ticket, create_tickets_bulk, get_tickets_page
+
+LISTINGS = [
+    ('all, comments', lambda: get_tickets_page()),
+    ('all, comment counts', lambda: get_tickets_page(fields=['id', 'title', 'status', 'priority', 'comment_count'])),
+    ('page of 50', lambda: get_tickets_page(limit=50)),
+]
+# Comparison only: one lazy comments SELECT per ticket
+LAZY = ('lazy to_dict', lambda: [ticket.to_dict() for ticket in Ticket.query.order_by(Ticket.created_at.desc())])
+
+
+def grow(total, comments):
+    """Add tickets (each with `comments` comments) until there are `total`"""
+    existing = Ticket.query.count()
+    for start in range(existing, total, 1000):
+        created = create_tickets_bulk([{'title': f'Ticket {i}', 'description': 'Created by query_count_bench.py'}
+                                       for i in range(start, min(start + 1000, total))])
+        db.session.execute(db.insert(Comment), [{'ticket_id': ticket['id'], 'author': 'customer', 'message': f'Comment {n}'}
+                                               for ticket in created for n in range(comments)])
+        db.session.commit()
+
+
+def measure(call):
+    """(statements sent, milliseconds) for one call, on a fresh session"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db.session.remove()
+    event.listen(db.engine, 'before_cursor_execute', record)
+    start = time.perf_counter()
+    try:
+        call()
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return len(statements), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the queries each ticket listing path sends as tickets grow")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Comma-separated ticket counts")
+    parser.add_argument("--comments", type=int, default=3, help="Comments per ticket")
+    parser.add_argument("--lazy-max", type=int, default=10000, help="Skip the lazy comparison above this size")
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='query-count-') as directory:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'tickets.db')}"
+        db.init_app(app)
+        configure_engine(app)
+        with app.app_context():
+            init_db()
+            for size in sizes:
+                grow(size, args.comments)
+                for name, call in LISTINGS + [LAZY]:
+                    if name == LAZY[0] and size > args.lazy_max:
+                        continue
+                    results.setdefault(name, {})[size] = measure(call)
+
+    print(f"\n{'listing':<22}" + "".join(f"{f'{size} tickets':>24}" for size in sizes))
+    for name, by_size in results.items():
+        cells = [f"{by_size[size][0]:>6} queries {by_size[size][1]:>8.1f}ms" if size in by_size else f"{'-':>24}"
+                 for size in sizes]
+        print(f"{name:<22}" + "".join(cells))
+
+    growing = [name for name, _ in LISTINGS if len({queries for queries, _ in results[name].values()}) > 1]
+    for name in growing:
+        print(f"FAIL {name}: query count grows with the number of tickets")
+    print("\nquery counts are constant" if not growing else "")
+    sys.exit(1 if growing else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Production server for the BeanBotics Ticketing System
+
+`python app.py` runs Flask's threaded development server, which needs a thread
+per agent websocket. This runs the same app on gevent instead, so each
+connection is a greenlet and one process can hold thousands of them:
+
+    python serve.py --port 5000 --max-connections 5000
+
+This is a single-node deployment: one process owns every Socket.IO connection,
+the subscription rooms and the response cache, so no message queue is needed.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import os
+import socket
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ticketing app on gevent")
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=5000, help="Port to listen on")
+    parser.add_argument("--max-connections", type=int, default=5000,
+                        help="Maximum concurrent HTTP and websocket connections (greenlet pool size)")
+    parser.add_argument("--backlog", type=int, default=2048, help="Listen socket backlog")
+    parser.add_argument("--db-pool-size", type=int, default=20, help="SQLAlchemy connection pool size")
+    parser.add_argument("--access-log", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    # app.py reads these at import time
+    os.environ["TICKETS_ASYNC_MODE"] = "gevent"
+    os.environ["TICKETS_DB_POOL_SIZE"] = str(args.db_pool_size)
+
+    from gevent import pywsgi
+    from gevent.pool import Pool
+    from geventwebsocket.handler import WebSocketHandler
+    from app import app
+
+    listener = socket.create_server((args.host, args.port), backlog=args.backlog)
+    # Accepted sockets inherit this; without it keep-alive clients (such as the MCP
+    # server's pooled client) stall ~40ms per response on Nagle + delayed ACK
+    listener.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    server = pywsgi.WSGIServer(listener, app, handler_class=WebSocketHandler,
+                               spawn=Pool(args.max_connections),
+                               log='default' if args.access_log else None)
+
+    print(f"🎫 BeanBotics Ticketing System on gevent at http://{args.host}:{args.port} "
+          f"(max {args.max_connections} connections)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Socket.IO load test for the BeanBotics Ticketing System
+
+Opens many Socket.IO clients, then creates tickets through the API and measures
+how long each ticket_created event takes to reach every client. Reports
+connection capacity (connected/failed, connect time) and delivery latency.
+
+    python serve.py &
+    python socket_loadtest.py --clients 500 --tickets 20
+"""
+import argparse
+import asyncio
+import time
+import aiohttp
+import socketio
+from loadtest import percentile
+
+
+class LoadClient:
+    """One Socket.IO client recording when each load-test ticket reaches it"""
+
+    def __init__(self, sent_at, latencies):
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.sent_at = sent_at
+        self.latencies = latencies
+        self.sio.on('ticket_created', self.on_ticket_created)
+        self.sio.on('tickets_created', self.on_tickets_created)
+
+    def _record(self, ticket):
+        sent = self.sent_at.get(ticket['title'])
+        if sent is not None:
+            self.latencies.append((time.perf_counter() - sent) * 1000)
+
+    async def on_ticket_created(self, data):
+        self._record(data['ticket'])
+
+    async def on_tickets_created(self, data):
+        for ticket in data['tickets']:
+            self._record(ticket)
+
+
+async def connect_all(url, count, concurrency, sent_at, latencies):
+    semaphore = asyncio.Semaphore(concurrency)
+    connect_times, failures = [], []
+
+    async def connect_one():
+        client = LoadClient(sent_at, latencies)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await client.sio.connect(url, transports=['websocket'])
+                connect_times.append((time.perf_counter() - start) * 1000)
+                return client
+            except Exception as e:
+                failures.append(str(e))
+                return None
+
+    clients = await asyncio.gather(*[connect_one() for _ in range(count)])
+    return [c for c in clients if c], connect_times, failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Socket.IO connection and delivery load test")
+    parser.add_argument("--url", default="http://localhost:5000", help="Ticketing server URL")
+    parser.add_argument("--clients", type=int, default=200, help="Socket.IO clients to open")
+    parser.add_argument("--connect-concurrency", type=int, default=50, help="Clients connecting at once")
+    parser.add_argument("--tickets", type=int, default=20, help="Tickets to create while clients listen")
+    parser.add_argument("--interval", type=float, default=0.25, help="Seconds between ticket creations")
+    args = parser.parse_args()
+
+    sent_at, latencies = {}, []
+    start = time.perf_counter()
+    clients, connect_times, failures = await connect_all(
+        args.url, args.clients, args.connect_concurrency, sent_at, latencies)
+    elapsed = time.perf_counter() - start
+    print(f"connect  ok={len(clients)} failed={len(failures)} in {elapsed:.1f}s  "
+          f"p50={percentile(connect_times, 50):.1f}ms  p99={percentile(connect_times, 99):.1f}ms")
+    if failures:
+        print(f"         first failure: {failures[0]}")
+
+    async with aiohttp.ClientSession() as session:
+        for i in range(args.tickets):
+            title = f"socket-loadtest-{start:.0f}-{i}"
+            sent_at[title] = time.perf_counter()
+            async with session.post(f"{args.url}/api/tickets", json={
+                "title": title,
+                "description": "Created by socket_loadtest.py",
+                "priority": "low"
+            }) as response:
+                response.raise_for_status()
+            await asyncio.sleep(args.interval)
+    # Let in-flight events arrive
+    await asyncio.sleep(2)
+
+    expected = len(clients) * args.tickets
+    print(f"delivery received={len(latencies)}/{expected}  "
+          f"p50={percentile(latencies, 50):.1f}ms  p99={percentile(latencies, 99):.1f}ms  "
+          f"max={max(latencies, default=0):.1f}ms")
+
+    await asyncio.gather(*[c.sio.disconnect() for c in clients])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
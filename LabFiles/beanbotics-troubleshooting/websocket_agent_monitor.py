@@ -4,11 +4,42 @@ WebSocket Agent Monitor for BeanBotics Ticketing System
 Listens to ticketing events and responds using Fast-Agent MCP.
 """
 import socketio
+import aiohttp
 import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from contextlib import AsyncExitStack, closing
 from datetime import datetime
 from fast_agent.core.fastagent import FastAgent
 
 # Configuration
+SERVER_URL = os.environ.get("TICKETS_SERVER_URL", "http://localhost:5000")
+# Last fully handled event-log sequence number, so a restarted monitor resumes where it stopped
+STATE_FILE = os.environ.get("MONITOR_STATE_FILE", "monitor_state.json")
+CATCH_UP_BATCH_SIZE = 500
+# Set MONITOR_SHARD_DB to a SQLite file shared by several monitor processes to
+# split tickets between them; MONITOR_STATE_FILE is not used in that mode
+SHARD_DB = os.environ.get("MONITOR_SHARD_DB")
+SHARD_PARTITIONS = int(os.environ.get("MONITOR_SHARD_PARTITIONS", 64))
+SHARD_LEASE_TTL = float(os.environ.get("MONITOR_SHARD_LEASE_TTL", 15))
+AGENT_WORKERS = int(os.environ.get("MONITOR_AGENT_WORKERS", 4))
+QUEUE_MAX_SIZE = int(os.environ.get("MONITOR_QUEUE_SIZE", 100))
+METRICS_INTERVAL = float(os.environ.get("MONITOR_METRICS_INTERVAL", 60))
+HEALTH_CHECK_INTERVAL = float(os.environ.get("MONITOR_HEALTH_CHECK_INTERVAL", 30))
+HEALTH_CHECK_TIMEOUT = 10
+# A ticket's events are merged until none arrives for DEBOUNCE_WINDOW seconds,
+# or DEBOUNCE_MAX_WAIT seconds after the first one
+DEBOUNCE_WINDOW = float(os.environ.get("MONITOR_DEBOUNCE_WINDOW", 2.0))
+DEBOUNCE_MAX_WAIT = float(os.environ.get("MONITOR_DEBOUNCE_MAX_WAIT", 10.0))
+# Comma-separated comment authors and event sources ("api", or "web" for the web UI) to ignore
+IGNORE_AUTHORS = {a.strip() for a in os.environ.get("MONITOR_IGNORE_AUTHORS", "BeanBotics AI").split(",") if a.strip()}
+IGNORE_SOURCES = {s.strip() for s in os.environ.get("MONITOR_IGNORE_SOURCES", "").split(",") if s.strip()}
+
 SYSTEM_PROMPT = """You are a BeanBotics ticketing support agent.
 
 Your task is to resolve tickets by:
@@ -24,10 +55,116 @@ Please use "BeanBotics AI" as your name."""
 # Initialize FastAgent
 fast = FastAgent("BeanBotics Ticketing Agent")
 
+class AgentRuntime:
+    """One FastAgent app, and the MCP server processes behind it, kept for the monitor's lifetime
+
+    Entering fast.run() starts the servers from fastagent.config.yaml and
+    connects the agents to them, so it is done once at startup rather than per
+    event. Before a turn the connection is health-checked (at most every
+    HEALTH_CHECK_INTERVAL seconds) by listing the agent's tools, and again
+    straight after a failed turn; if the check fails the app is torn down and
+    started again.
+
+    fast-agent records every turn in the agent's history even with
+    use_history=False, so the history is cleared whenever no turn is in flight,
+    with agent.clear() (fast-agent 0.3.x, the /clear command). An agent without
+    clear() is replaced instead: the app is restarted before the next turn.
+    """
+
+    def __init__(self, fast, agent_name):
+        self.fast = fast
+        self.agent_name = agent_name
+        self.app = None
+        self._stack = None
+        self._lock = asyncio.Lock()
+        self._last_check = 0.0
+        self._in_flight = 0
+        self._replace_agent = False
+        self.starts = 0
+        self.startup_times = []
+
+    async def start(self):
+        async with self._lock:
+            if self.app is None:
+                await self._start()
+
+    async def _start(self):
+        started = time.perf_counter()
+        self._stack = AsyncExitStack()
+        self.app = await self._stack.enter_async_context(self.fast.run())
+        self._last_check = time.monotonic()
+        self._replace_agent = False
+        self.starts += 1
+        self.startup_times.append(time.perf_counter() - started)
+        print(f"🚀 FastAgent runtime started in {self.startup_times[-1]:.2f}s")
+
+    async def stop(self):
+        async with self._lock:
+            await self._stop()
+
+    async def _stop(self):
+        stack, self.app, self._stack = self._stack, None, None
+        if stack is not None:
+            try:
+                await stack.aclose()
+            except Exception as e:
+                print(f"⚠️ Error shutting down FastAgent runtime: {e}")
+
+    async def _healthy(self):
+        try:
+            await asyncio.wait_for(self.app[self.agent_name].list_tools(), HEALTH_CHECK_TIMEOUT)
+            return True
+        except Exception as e:
+            print(f"⚠️ FastAgent health check failed: {e}")
+            return False
+
+    async def ensure_healthy(self, force=False):
+        """Start the app, or restart it if its MCP connections no longer answer"""
+        async with self._lock:
+            if self.app is None:
+                await self._start()
+                return
+            if self._replace_agent and self._in_flight == 0:
+                print("🔄 Restarting FastAgent runtime to clear the agent history (no agent.clear())")
+                await self._stop()
+                await self._start()
+                return
+            if not force and time.monotonic() - self._last_check < HEALTH_CHECK_INTERVAL:
+                return
+            if await self._healthy():
+                self._last_check = time.monotonic()
+                return
+            print("🔄 Restarting FastAgent runtime")
+            await self._stop()
+            await self._start()
+
+    async def send(self, message):
+        await self.ensure_healthy()
+        agent = self.app[self.agent_name]
+        self._in_flight += 1
+        try:
+            return await agent.send(message)
+        except Exception:
+            await self.ensure_healthy(force=True)
+            raise
+        finally:
+            self._in_flight -= 1
+            # use_history=False turns don't read the history, but it is still
+            # recorded; drop it between turns so a long-lived agent doesn't grow
+            if self._in_flight == 0:
+                self._clear_history(agent)
+
+    def _clear_history(self, agent):
+        if hasattr(agent, 'clear'):
+            agent.clear()
+        else:
+            self._replace_agent = True
+
 @fast.agent(instruction=SYSTEM_PROMPT, servers=["tickets"], use_history=False)
 async def ticketing_agent(message):
-    async with fast.run() as agent:
-        await agent(message)
+    return await agent_runtime.send(message)
+
+agent_runtime = AgentRuntime(fast, "ticketing_agent")
 
 # Initialize Socket.IO client
 sio = socketio.AsyncClient()
@@ -53,13 +190,594 @@ def print_event(event_name, data):
     print("-" * 50)
 
 async def send_to_agent(prompt):
-    """Send prompt to FastAgent and handle response"""
+    """Send prompt to FastAgent and print the response"""
     print(f"🤖 Sending to FastAgent: {prompt}")
+    response = await ticketing_agent(prompt)
+    print(f"📝 FastAgent Response: {response}")
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of durations"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))]
+
+class AgentWorkPool:
+    """Runs agent prompts on a fixed number of concurrent workers
+
+    Jobs for the same ticket run one at a time in arrival order: a worker that
+    picks up a job for a ticket another worker is handling parks it on that
+    ticket, and the worker holding the ticket runs it next. At most max_size
+    jobs wait at once; beyond that submit() blocks. The debouncer counts
+    blocked submissions towards its own limit, so the wait carries back to
+    dispatch() and the incoming events.
+    """
+
+    def __init__(self, handler, workers=4, max_size=100):
+        self.handler = handler
+        self.workers = workers
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(max_size)
+        self._active = {}  # ticket_id -> jobs parked behind the one running
+        self._tasks = []
+        self._blocked = 0  # submitters waiting for a free slot
+        self.waiting = 0
+        self.max_waiting = 0
+        self.processed = 0
+        self.failed = 0
+        self.backpressure_waits = 0
+        self.wait_times = deque(maxlen=1000)
+        self.process_times = deque(maxlen=1000)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, ticket_id, prompt, on_done=None):
+        """Queue a prompt for a ticket, waiting for room if the queue is full
+
+        on_done() is called once the agent turn has finished, successfully or
+        with an error, but not if it is cancelled.
+        """
+        if self._slots.locked():
+            if self._blocked == 0:
+                print(f"⏳ Agent queue full ({self.waiting} waiting), holding new prompts")
+            self.backpressure_waits += 1
+            self._blocked += 1
+            try:
+                await self._slots.acquire()
+            finally:
+                self._blocked -= 1
+        else:
+            await self._slots.acquire()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        await self._queue.put((ticket_id, prompt, time.perf_counter(), on_done))
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            ticket_id = job[0]
+            if ticket_id in self._active:
+                self._active[ticket_id].append(job)
+                continue
+            parked = self._active[ticket_id] = deque()
+            try:
+                while job is not None:
+                    await self._run(job)
+                    job = parked.popleft() if parked else None
+            finally:
+                del self._active[ticket_id]
+
+    async def _run(self, job):
+        ticket_id, prompt, queued_at, on_done = job
+        self.waiting -= 1
+        self._slots.release()
+        started = time.perf_counter()
+        self.wait_times.append(started - queued_at)
+        try:
+            await self.handler(prompt)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"❌ FastAgent error on ticket #{ticket_id}: {e}")
+        finally:
+            self.process_times.append(time.perf_counter() - started)
+        # Not reached when the turn is cancelled at shutdown: its events stay
+        # held, so the checkpoint doesn't pass them and a restart replays them
+        if on_done is not None:
+            on_done()
+
+    def metrics(self):
+        return {
+            'queue_depth': self.waiting,
+            'max_queue_depth': self.max_waiting,
+            'busy_workers': len(self._active),
+            'processed': self.processed,
+            'failed': self.failed,
+            'backpressure_waits': self.backpressure_waits,
+            'wait_p50': percentile(self.wait_times, 50),
+            'wait_p99': percentile(self.wait_times, 99),
+            'process_p50': percentile(self.process_times, 50),
+            'process_p99': percentile(self.process_times, 99),
+        }
+
+    def print_metrics(self):
+        m = self.metrics()
+        print(f"📊 Agent queue: depth={m['queue_depth']} (max {m['max_queue_depth']}) "
+              f"busy={m['busy_workers']}/{self.workers} processed={m['processed']} failed={m['failed']} "
+              f"backpressure={m['backpressure_waits']}  "
+              f"wait p50={m['wait_p50']:.1f}s p99={m['wait_p99']:.1f}s  "
+              f"process p50={m['process_p50']:.1f}s p99={m['process_p99']:.1f}s")
+
+work_pool = AgentWorkPool(send_to_agent, workers=AGENT_WORKERS, max_size=QUEUE_MAX_SIZE)
+
+class TicketEventDebouncer:
+    """Merges bursts of events on a ticket into a single agent prompt
+
+    Events are dropped if their source or comment author matches the ignore
+    rules, or if their idempotency key (ticket id for creations, comment id
+    for comments) has been seen before, e.g. when an event is replayed. The
+    rest collect per ticket until the ticket has been quiet for `window`
+    seconds, or `max_wait` seconds after its first event, and are then
+    submitted as one prompt. Once max_pending prompts are pending or blocked
+    in submit(), wait_for_room() holds back new events.
+    """
+
+    def __init__(self, submit, window=2.0, max_wait=10.0, ignore_authors=(), ignore_sources=(), max_keys=10000,
+                 checkpoint=None, max_pending=100):
+        self.submit = submit
+        self.checkpoint = checkpoint
+        self.max_pending = max_pending
+        self._gate = asyncio.Lock()
+        self._room = asyncio.Event()
+        self._submitting = 0  # prompts blocked in submit() waiting for a work pool slot
+        self._holding = False
+        self.window = window
+        self.max_wait = max_wait
+        self.ignore_authors = set(ignore_authors)
+        self.ignore_sources = set(ignore_sources)
+        self.max_keys = max_keys
+        self._seen = OrderedDict()
+        self._pending = {}  # ticket_id -> batch of events waiting to be submitted
+        self.events = 0
+        self.duplicates = 0
+        self.ignored = 0
+        self.prompts = 0
+        self.backpressure_waits = 0
+
+    def _is_new(self, key):
+        if key in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen[key] = True
+        if len(self._seen) > self.max_keys:
+            self._seen.popitem(last=False)
+        return True
+
+    def _ignored_source(self, data, item):
+        # Merged events carry each ticket's or comment's own source
+        source = item['source'] if 'source' in item else data.get('source')
+        if (source or 'web') in self.ignore_sources:
+            self.ignored += 1
+            return True
+        return False
+
+    def _batch(self, ticket_id, title, seq):
+        now = time.monotonic()
+        batch = self._pending.get(ticket_id)
+        if batch is None:
+            batch = self._pending[ticket_id] = {'ticket': None, 'title': title, 'comments': [], 'seqs': [], 'first': now}
+            batch['task'] = asyncio.create_task(self._submit_when_quiet(ticket_id))
+        batch['last'] = now
+        if self.checkpoint is not None and seq is not None:
+            # The event isn't handled until the turn it was merged into finishes
+            self.checkpoint.hold(seq)
+            batch['seqs'].append(seq)
+        return batch
+
+    def _release(self, batch):
+        if self.checkpoint is not None:
+            for seq in batch['seqs']:
+                self.checkpoint.release(seq)
+
+    @property
+    def pending_tickets(self):
+        return len(self._pending)
+
+    @property
+    def backlog(self):
+        """Prompts not yet accepted by the work pool"""
+        return len(self._pending) + self._submitting
+
+    async def wait_for_room(self):
+        """Wait until the backlog is below max_pending
+
+        Waiters pass one at a time in arrival order (asyncio.Lock is FIFO), so
+        a ticket's events are never reordered while they are held.
+        """
+        async with self._gate:
+            if self.backlog < self.max_pending:
+                self._holding = False
+                return
+            self.backpressure_waits += 1
+            if not self._holding:
+                self._holding = True
+                print(f"⏳ {self.backlog} tickets waiting for the agent queue, holding new events")
+            while self.backlog >= self.max_pending:
+                self._room.clear()
+                await self._room.wait()
+
+    def add_ticket(self, data, ticket):
+        self.events += 1
+        if self._ignored_source(data, ticket) or not self._is_new(('ticket', ticket['id'])):
+            return
+        self._batch(ticket['id'], ticket['title'], data.get('seq'))['ticket'] = ticket
+
+    def add_comments(self, data, comments):
+        self.events += len(comments)
+        kept = []
+        for comment in comments:
+            if self._ignored_source(data, comment):
+                continue
+            if comment['author'] in self.ignore_authors:
+                self.ignored += 1
+                print(f"🤖 Ignoring comment by {comment['author']}")
+            elif self._is_new(('comment', comment['id'])):
+                kept.append(comment)
+        if kept:
+            self._batch(data['ticket_id'], data.get('ticket_title'), data.get('seq'))['comments'].extend(kept)
+
+    def drop(self, ticket_id, handled=True):
+        """Forget a ticket's pending events, e.g. because it was deleted
+
+        With handled=False they stay held in the checkpoint, so a restarted
+        monitor replays them.
+        """
+        batch = self._pending.pop(ticket_id, None)
+        if batch is not None:
+            batch['task'].cancel()
+            self._room.set()
+            if handled:
+                self._release(batch)
+
+    async def _submit_when_quiet(self, ticket_id):
+        while True:
+            batch = self._pending[ticket_id]
+            delay = min(batch['last'] + self.window, batch['first'] + self.max_wait) - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        batch = self._pending.pop(ticket_id)
+        self.prompts += 1
+        self._submitting += 1
+        try:
+            await self.submit(ticket_id, self.prompt(ticket_id, batch), on_done=lambda: self._release(batch))
+        finally:
+            self._submitting -= 1
+            self._room.set()
+
+    @staticmethod
+    def prompt(ticket_id, batch):
+        ticket, comments = batch['ticket'], batch['comments']
+        lines = "\n".join(f"- {c['author']}: {c['message']}" for c in comments)
+        if ticket is not None:
+            prompt = f"New ticket: {ticket['title']}\nDescription: {ticket['description']}"
+            return f"{prompt}\nComments since it was opened:\n{lines}" if comments else prompt
+        if len(comments) == 1:
+            return f"New comment on ticket #{ticket_id}: {comments[0]['message']}"
+        return f"New comments on ticket #{ticket_id}:\n{lines}"
+
+    def reset(self):
+        """Forget every pending event and idempotency key, because every ticket was deleted
+
+        Ticket ids start again from 1 afterwards, so the old keys would
+        drop the new tickets' events as duplicates.
+        """
+        for ticket_id in list(self._pending):
+            self.drop(ticket_id)
+        self._seen.clear()
+
+    def cancel_all(self):
+        for ticket_id in list(self._pending):
+            self.drop(ticket_id, handled=False)
+
+    def print_metrics(self):
+        print(f"📊 Events: received={self.events} duplicates={self.duplicates} ignored={self.ignored} "
+              f"pending_tickets={len(self._pending)} prompts={self.prompts} backpressure={self.backpressure_waits}")
+
+class EventCheckpoint:
+    """The event-log sequence number the monitor has fully handled, saved across restarts
+
+    An event is held from when it arrives until every agent turn it was merged
+    into has finished, and the checkpoint only advances to just below the
+    oldest held event. Catching up from the checkpoint after a reconnect or
+    restart therefore never skips work; events whose turns finished beyond it
+    may run again. With no path the checkpoint is kept in memory only.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seq = self._load()
+        self._held = Counter()
+        self._highest = self.seq or 0
+
+    def _load(self):
+        if self.path is None:
+            return None
+        try:
+            with open(self.path) as f:
+                return json.load(f)['seq']
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def hold(self, seq):
+        if seq is None:
+            return
+        self._held[seq] += 1
+        self._highest = max(self._highest, seq)
+
+    def release(self, seq):
+        if seq is None:
+            return
+        self._held[seq] -= 1
+        if self._held[seq] <= 0:
+            del self._held[seq]
+        self._advance()
+
+    def start_at(self, seq):
+        """First run: skip the existing log and start from seq"""
+        self._highest = max(self._highest, seq)
+        self._advance()
+
+    @property
+    def latest(self):
+        """Highest seq dispatched so far, live or replayed, or the saved checkpoint"""
+        return self._highest
+
+    @property
+    def safe_seq(self):
+        """Highest seq below every held event, including replayed ones older than self.seq"""
+        if self._held:
+            return min(self._held) - 1 if self.seq is None else min(self.seq, min(self._held) - 1)
+        return self.seq
+
+    def _advance(self):
+        position = min(self._held) - 1 if self._held else self._highest
+        if self.seq is None or position > self.seq:
+            self.seq = position
+            if self.path is None:
+                return
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'seq': position}, f)
+            os.replace(tmp_path, self.path)
+
+class ShardCoordinator:
+    """Splits tickets between monitor processes sharing a SQLite lease table
+
+    Tickets map to one of `partitions` partitions by ticket id. Every member
+    heartbeats into the members table and derives the same assignment from
+    the sorted list of live members (partition i goes to member i % N), then
+    releases and claims partition leases to match. Claims only succeed on
+    free or expired leases, so a partition never has two owners even while
+    members disagree mid-rebalance. Each lease row also records the event seq
+    its owner has handled, and whoever takes the partition over replays the
+    event log from there. A member that stops heartbeating loses its
+    partitions after lease_ttl seconds.
+    """
+
+    def __init__(self, path, partitions=64, lease_ttl=15.0):
+        self.path = path
+        self.partitions = partitions
+        self.lease_ttl = lease_ttl
+        self.member_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.owned = set()
+        self.members = 0
+        # Newly claimed partitions report no more than their starting seq until their catch-up has run
+        self._floors = {}
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS members (member_id TEXT PRIMARY KEY, heartbeat_at REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS partitions ('
+                         'partition INTEGER PRIMARY KEY, owner TEXT, expires_at REAL NOT NULL DEFAULT 0, seq INTEGER)')
+            conn.executemany('INSERT OR IGNORE INTO partitions (partition) VALUES (?)',
+                             [(p,) for p in range(partitions)])
+
+    def _connect(self):
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def partition(self, ticket_id):
+        return ticket_id % self.partitions
+
+    def owns(self, ticket_id):
+        return self.partition(ticket_id) in self.owned
+
+    def caught_up(self, partitions):
+        for p in partitions:
+            self._floors.pop(p, None)
+
+    def rebalance(self, seq):
+        """Heartbeat and adjust leases to the current member list
+
+        seq is the event seq handled so far, recorded on owned partitions.
+        Returns {partition: seq} for newly claimed partitions, where seq is
+        where the previous owner left off (None if never owned).
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('INSERT INTO members (member_id, heartbeat_at) VALUES (?, ?) '
+                             'ON CONFLICT (member_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at',
+                             (self.member_id, now))
+                conn.execute('DELETE FROM members WHERE heartbeat_at < ?', (now - self.lease_ttl,))
+                members = [row[0] for row in conn.execute('SELECT member_id FROM members ORDER BY member_id')]
+                index = members.index(self.member_id)
+                wanted = {p for p in range(self.partitions) if p % len(members) == index}
+
+                for p in self.owned - wanted:
+                    self._floors.pop(p, None)
+                    conn.execute('UPDATE partitions SET owner = NULL, expires_at = 0, seq = COALESCE(?, seq) '
+                                 'WHERE partition = ? AND owner = ?', (seq, p, self.member_id))
+                for p in self.owned & wanted:
+                    floor = self._floors.get(p, seq)
+                    report = floor if seq is None or floor is None else min(floor, seq)
+                    conn.execute('UPDATE partitions SET expires_at = ?, seq = COALESCE(?, seq) '
+                                 'WHERE partition = ? AND owner = ?', (now + self.lease_ttl, report, p, self.member_id))
+                claimed = {}
+                for p in wanted - self.owned:
+                    row = conn.execute('UPDATE partitions SET owner = ?, expires_at = ? '
+                                       'WHERE partition = ? AND (owner IS NULL OR owner = ? OR expires_at < ?) '
+                                       'RETURNING seq', (self.member_id, now + self.lease_ttl, p, self.member_id, now)
+                                       ).fetchone()
+                    if row is not None:
+                        claimed[p] = row[0]
+                        self._floors[p] = row[0]
+                owned = {row[0] for row in conn.execute(
+                    'SELECT partition FROM partitions WHERE owner = ? AND expires_at >= ?', (self.member_id, now))}
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        self.owned = owned
+        self.members = len(members)
+        return claimed
+
+    def leave(self, seq):
+        """Release every lease and drop out of the group so others rebalance right away"""
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('UPDATE partitions SET owner = NULL, expires_at = 0, seq = COALESCE(?, seq) WHERE owner = ?',
+                         (seq, self.member_id))
+            conn.execute('DELETE FROM members WHERE member_id = ?', (self.member_id,))
+            conn.execute('COMMIT')
+        self.owned = set()
+
+shard = ShardCoordinator(SHARD_DB, SHARD_PARTITIONS, SHARD_LEASE_TTL) if SHARD_DB else None
+checkpoint = EventCheckpoint(None if shard else STATE_FILE)
+debouncer = TicketEventDebouncer(work_pool.submit, window=DEBOUNCE_WINDOW, max_wait=DEBOUNCE_MAX_WAIT,
+                                 ignore_authors=IGNORE_AUTHORS, ignore_sources=IGNORE_SOURCES,
+                                 checkpoint=checkpoint, max_pending=QUEUE_MAX_SIZE)
+
+async def dispatch(event, data, partitions=None, replay=False):
+    """Hand a live or replayed ticketing event to the debouncer
+
+    Waits first while the debouncer's backlog is full. When sharded, only tickets in this monitor's partitions are handled, or
+    only those in `partitions` when replaying for newly claimed ones.
+    A replayed tickets_reset is skipped if anything after it has already
+    been dispatched, and a partition replay skips resets altogether.
+    """
+    def mine(ticket_id):
+        if shard is None:
+            return True
+        if partitions is not None:
+            return shard.partition(ticket_id) in partitions
+        return shard.owns(ticket_id)
+
+    await debouncer.wait_for_room()
+    # No awaits below, so events reach the debouncer in the order they passed the gate
+    if event == 'tickets_reset' and (partitions is not None or replay and data['seq'] <= checkpoint.latest):
+        # Resetting would drop newer live batches and the keys that make already
+        # handled replays duplicates. A partition replay would also reset the
+        # partitions this monitor already owned; the reset reached it live.
+        return
+    checkpoint.hold(data.get('seq'))
+    try:
+        if event in ('ticket_created', 'tickets_created'):
+            for ticket in data['tickets'] if event == 'tickets_created' else [data['ticket']]:
+                if mine(ticket['id']):
+                    debouncer.add_ticket(data, ticket)
+        elif event == 'tickets_reset':
+            debouncer.reset()
+        elif not mine(data['ticket_id']):
+            return
+        elif event == 'comment_created':
+            debouncer.add_comments(data, [data['comment']])
+        elif event == 'comments_created':
+            debouncer.add_comments(data, data['comments'])
+        elif event == 'ticket_deleted':
+            debouncer.drop(data['ticket_id'])
+    finally:
+        checkpoint.release(data.get('seq'))
+
+async def catch_up(after=None, partitions=None):
+    """Replay events logged since the checkpoint (or `after`), a batch at a time
+
+    Replayed events that also arrived live are skipped by the debouncer's
+    idempotency keys. On the very first run the existing log is skipped.
+    With partitions set, only those partitions' tickets are replayed.
+    """
+    async with aiohttp.ClientSession(base_url=SERVER_URL) as session:
+        async def fetch(after, limit):
+            async with session.get('/api/events', params={'after': after, 'limit': limit}) as response:
+                response.raise_for_status()
+                return await response.json()
+
+        if after is None and partitions is None:
+            if checkpoint.seq is None:
+                page = await fetch(0, 1)
+                checkpoint.start_at(page['latest_seq'])
+                print(f"⏩ First run: starting after event #{page['latest_seq']}")
+                return
+            after = checkpoint.seq
+        replayed = 0
+        while True:
+            page = await fetch(after, CATCH_UP_BATCH_SIZE)
+            if replayed == 0 and page['oldest_seq'] > after + 1:
+                print(f"⚠️ Events #{after + 1}-#{page['oldest_seq'] - 1} were pruned from the server log and can't be replayed")
+            for entry in page['events']:
+                # Holds the replay while queued work drains
+                await dispatch(entry['event'], {**entry['payload'], 'seq': entry['seq']}, partitions, replay=True)
+            replayed += len(page['events'])
+            if not page['has_more']:
+                break
+            after = page['events'][-1]['seq']
+        print(f"⏪ Caught up on {replayed} missed events" if replayed else "⏪ No missed events")
+
+catch_up_task = None
+
+async def run_catch_up():
     try:
-        response = await ticketing_agent(prompt)
-        print(f"📝 FastAgent Response: {response}")
+        await catch_up()
     except Exception as e:
-        print(f"❌ FastAgent error: {e}")
+        print(f"❌ Catch-up failed: {e}")
+
+async def take_over(claimed):
+    """Replay newly claimed partitions from where their previous owner left off"""
+    resume = [seq for seq in claimed.values() if seq is not None]
+    try:
+        if resume:
+            await catch_up(after=min(resume), partitions=set(claimed))
+        shard.caught_up(claimed)
+    except Exception as e:
+        print(f"❌ Catch-up for partitions {sorted(claimed)} failed: {e}")
+
+async def run_shard_heartbeats():
+    """Heartbeat into the shard group and take over partitions as members come and go"""
+    while True:
+        try:
+            owned = shard.owned
+            claimed = await asyncio.to_thread(shard.rebalance, checkpoint.safe_seq)
+            if shard.owned != owned:
+                print(f"🧩 Rebalanced: took {len(claimed)}, released {len(owned - shard.owned)} partitions; "
+                      f"now own {len(shard.owned)}/{shard.partitions} ({shard.members} monitors)")
+            if claimed:
+                asyncio.create_task(take_over(claimed))
+        except Exception as e:
+            print(f"❌ Shard heartbeat failed: {e}")
+        await asyncio.sleep(shard.lease_ttl / 3)
+
+async def report_metrics():
+    while True:
+        await asyncio.sleep(METRICS_INTERVAL)
+        debouncer.print_metrics()
+        work_pool.print_metrics()
 
 # Socket.IO event handlers
 @sio.event
@@ -67,7 +785,13 @@ async def connect():
     print("🟢 Connected to BeanBotics Ticketing System!")
     print("   Listening for events... Press Ctrl+C to disconnect")
     print("=" * 50)
-    await sio.emit('subscribe_to_tickets')
+    # Let the server drop our own comments instead of waking us for them
+    await sio.emit('subscribe_to_tickets', {'exclude_authors': sorted(IGNORE_AUTHORS)})
+    # Replay whatever was logged while we were away; in a task so live events keep flowing
+    global catch_up_task
+    if catch_up_task is not None:
+        catch_up_task.cancel()
+    catch_up_task = asyncio.create_task(run_catch_up())
 
 @sio.event
 async def disconnect():
@@ -84,37 +808,64 @@ async def subscribed(data):
 @sio.event
 async def ticket_created(data):
     print_event('ticket_created', data)
-    prompt = f"New ticket: {data['ticket']['title']}\nDescription: {data['ticket']['description']}"
-    await send_to_agent(prompt)
+    await dispatch('ticket_created', data)
 
 @sio.event
 async def comment_created(data):
     print_event('comment_created', data)
-    # Skip AI comments to prevent loops
-    if data['comment']['author'] == 'BeanBotics AI':
-        print("🤖 Ignoring AI comment to prevent loop")
-        return
-    prompt = f"New comment on ticket #{data['ticket_id']}: {data['comment']['message']}"
-    await send_to_agent(prompt)
+    await dispatch('comment_created', data)
+
+@sio.event
+async def tickets_created(data):
+    print_event('tickets_created', data)
+    await dispatch('tickets_created', data)
+
+@sio.event
+async def comments_created(data):
+    print_event('comments_created', data)
+    await dispatch('comments_created', data)
 
 @sio.event
 async def ticket_deleted(data):
     print_event('ticket_deleted', data)
+    await dispatch('ticket_deleted', data)
+
+@sio.event
+async def tickets_reset(data):
+    print_event('tickets_reset', data)
+    await dispatch('tickets_reset', data)
 
 async def main():
     """Main function to start the WebSocket monitor"""
     print("🎫 BeanBotics WebSocket Agent Monitor")
-    print("Connecting to localhost:5000...")
+    print(f"Connecting to {SERVER_URL}... ({AGENT_WORKERS} agent workers, queue size {QUEUE_MAX_SIZE})")
     
+    await agent_runtime.start()
+    work_pool.start()
+    metrics_task = asyncio.create_task(report_metrics())
+    if shard is not None:
+        print(f"🧩 Sharded as {shard.member_id} via {SHARD_DB} ({shard.partitions} partitions)")
+        heartbeat_task = asyncio.create_task(run_shard_heartbeats())
     try:
-        await sio.connect('http://localhost:5000')
+        await sio.connect(SERVER_URL)
         await sio.wait()
     except KeyboardInterrupt:
         print("\n⏹️ Stopping monitor...")
         await sio.disconnect()
     except Exception as e:
         print(f"❌ Connection error: {e}")
-        print("Ensure BeanBotics Ticketing System is running on localhost:5000")
+        print(f"Ensure BeanBotics Ticketing System is running on {SERVER_URL}")
+    finally:
+        metrics_task.cancel()
+        if shard is not None:
+            heartbeat_task.cancel()
+        debouncer.cancel_all()
+        await work_pool.stop()
+        debouncer.print_metrics()
+        work_pool.print_metrics()
+        if shard is not None:
+            await asyncio.to_thread(shard.leave, checkpoint.safe_seq)
+        await agent_runtime.stop()
 
 if __name__ == '__main__':
     asyncio.run(main())
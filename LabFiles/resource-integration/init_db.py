@@ -1,11 +1,91 @@
 
+import argparse
+import random
 import sqlite3
+import time
+from itertools import islice
+from datetime import date, timedelta
 
 DB_FILE = "inventory.db"
+# Rows per executemany call when generating a large catalog
+BATCH_SIZE = 50_000
 
-def init_db():
+# Indexes for the server's lookups: listings sorted by category then name,
+# category filters, and low-stock queries on quantity
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_items_category_name ON items (category, name)",
+    # Not covered by the composite above: its entries for a category are in name
+    # order, while this one keeps them in rowid order, so a category listing by id
+    # reads only one page's worth of rows
+    "CREATE INDEX IF NOT EXISTS idx_items_category ON items (category)",
+    "CREATE INDEX IF NOT EXISTS idx_items_quantity ON items (quantity)",
+    # Partial index of items below their own reorder threshold (the server's low-stock alerts)
+    "CREATE INDEX IF NOT EXISTS idx_items_below_reorder ON items (category, name) WHERE quantity < reorder_threshold",
+]
+
+# Per category: price range, product nouns and description phrases for synthetic items
+CATALOG = {
+    "Electronics": ((19.99, 2499.99), ["Laptop", "Smartphone", "Tablet", "Earbuds", "Monitor", "Webcam", "Speaker"],
+                    "for work and play"),
+    "Furniture": ((49.99, 1299.99), ["Chair", "Desk", "Bookshelf", "Table", "Cabinet", "Lamp", "Sofa"],
+                  "for home and office"),
+    "Books": ((9.99, 89.99), ["Handbook", "Guide", "Cookbook", "Novel", "Textbook", "Workbook", "Anthology"],
+              "for curious readers"),
+    "Clothing": ((9.99, 199.99), ["T-Shirt", "Hoodie", "Jeans", "Jacket", "Sneakers", "Cap", "Socks"],
+                 "for everyday wear"),
+    "Tools": ((4.99, 399.99), ["Mouse", "Keyboard", "Hub", "Stand", "Cable", "Charger", "Dock"],
+              "for a productive setup"),
+    "Kitchen": ((4.99, 599.99), ["Espresso Machine", "Grinder", "Kettle", "Mug", "Pan", "Knife Set", "Blender"],
+                "for better coffee and cooking"),
+    "Sports": ((9.99, 899.99), ["Yoga Mat", "Dumbbell", "Bike Helmet", "Water Bottle", "Tent", "Racket", "Backpack"],
+               "for an active lifestyle"),
+    "Toys": ((4.99, 149.99), ["Robot Kit", "Puzzle", "Board Game", "Building Set", "Drone", "Plush", "Train Set"],
+             "for all ages"),
+}
+ADJECTIVES = ["Pro", "Classic", "Compact", "Deluxe", "Eco", "Smart", "Ultra", "Wireless", "Premium", "Mini",
+              "Heavy-Duty", "Travel", "Ergonomic", "Vintage", "Modular"]
+
+
+def generate_items(count, seed=None):
+    """Yield `count` synthetic items shaped like the sample data
+
+    Prices are uniform within each category's range, quantities are skewed
+    towards small stock levels (so low-stock queries return a realistic
+    fraction), reorder thresholds range from 2 to 10 (about 10% of items end
+    up below theirs) and last_updated dates fall within the past two years.
+    """
+    rng = random.Random(seed)
+    # Every name/description/date string is built once up front; rows then only pick from these
+    products = [(category, f"{adjective} {noun}", f"{adjective} {noun.lower()} {purpose}", low, high - low)
+                for category, ((low, high), nouns, purpose) in CATALOG.items()
+                for noun in nouns for adjective in ADJECTIVES]
+    today = date.today()
+    dates = [(today - timedelta(days=days)).isoformat() for days in range(730)]
+    for start in range(0, count, BATCH_SIZE):
+        size = min(BATCH_SIZE, count - start)
+        picks = zip(rng.choices(products, k=size), rng.choices(dates, k=size))
+        for i, ((category, name, description, low, spread), updated) in enumerate(picks, start + 1):
+            yield (f"{name} {i}", int(rng.expovariate(1 / 60)), round(low + spread * rng.random(), 2),
+                   category, description, updated, rng.randint(2, 10))
+
+
+def bulk_load(cursor, rows, seed=None):
+    """Insert `rows` generated items in batches; the caller commits once at the end"""
+    items = generate_items(rows, seed)
+    loaded = 0
+    while loaded < rows:
+        batch = list(islice(items, BATCH_SIZE))
+        cursor.executemany("INSERT INTO items (name, quantity, price, category, description, last_updated, "
+                           "reorder_threshold) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+        loaded += len(batch)
+    return loaded
+
+
+def init_db(rows=0, seed=None):
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
+    # A rebuilt database is disposable until it has been committed
+    cursor.execute("PRAGMA synchronous = OFF")
     cursor.execute("DROP TABLE IF EXISTS items")
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS items (
@@ -15,7 +95,8 @@ def init_db():
             price REAL,
             category TEXT,
             description TEXT,
-            last_updated TEXT
+            last_updated TEXT,
+            reorder_threshold INTEGER NOT NULL DEFAULT 20
         )
     ''')
     # Insert realistic sample data for lab testing
@@ -50,9 +131,22 @@ def init_db():
         ("USB-C Hub", 80, 59.99, "Tools", "Multi-port hub for connectivity", "2024-05-15"),
     ]
     cursor.executemany("INSERT OR IGNORE INTO items (name, quantity, price, category, description, last_updated) VALUES (?, ?, ?, ?, ?, ?)", sample_items)
+    start = time.perf_counter()
+    generated = bulk_load(cursor, rows, seed) if rows else 0
+    # Building indexes once after the load is much faster than maintaining them per insert
+    for statement in INDEXES:
+        cursor.execute(statement)
+    conn.commit()
+    cursor.execute("ANALYZE")
     conn.commit()
     conn.close()
-    print(f"Database initialized at {DB_FILE} with {len(sample_items)} records.")
+    print(f"Database initialized at {DB_FILE} with {len(sample_items) + generated} records.")
+    if generated:
+        print(f"Generated {generated} synthetic items in {time.perf_counter() - start:.1f}s.")
 
 if __name__ == "__main__":
-    init_db()
+    parser = argparse.ArgumentParser(description="Create the inventory database with sample data")
+    parser.add_argument("--rows", type=int, default=0, help="Also generate N synthetic items for benchmarking")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible synthetic data")
+    args = parser.parse_args()
+    init_db(args.rows, args.seed)
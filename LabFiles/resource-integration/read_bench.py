@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Resource read throughput of the inventory server, pooled vs per-call connections
+
+Copies inventory.db (or generates a larger catalog with init_db.py's
+--rows generator) into a temporary directory, then reads a mix of resources
+through an in-memory MCP client from concurrent callers, twice:
+- per-call: each helper opens its own sqlite3 connection and runs on the
+  event loop, as the server did before the connection pool
+- pooled: the server as shipped, per-thread connections on the pool's threads
+Besides throughput and latency it reports how late a 1ms timer fires while
+the reads run, i.e. how long the event loop is blocked:
+
+    python read_bench.py --reads 3000 --concurrency 32 --rows 200000
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from fastmcp import Client
+import init_db
+import server
+
+URIS = ["inventory://summary", "inventory://category/Books", "inventory://category/Tools/item/16",
+        "inventory://item_summary/3", "inventory://categories", "inventory://items"]
+
+
+class PerCallConnections:
+    """Stands in for server.db_pool with the old behaviour: a new connection per helper call, on the event loop"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def connection(self):
+        # Closed when the helper drops its last reference, as the old helpers did with close()
+        return sqlite3.connect(self.path)
+
+    async def run(self, func, *args):
+        return func(*args)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of durations"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))]
+
+
+async def read_mix(reads, concurrency):
+    """Read URIS round-robin; returns (elapsed seconds, latencies in ms, worst timer delay in ms)"""
+    async with Client(server.mcp) as client:
+        for uri in URIS:
+            await client.read_resource(uri)
+        limit = asyncio.Semaphore(concurrency)
+        latencies, delays = [], []
+        done = False
+
+        async def read(i):
+            async with limit:
+                start = time.perf_counter()
+                await client.read_resource(URIS[i % len(URIS)])
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        async def timer():
+            while not done:
+                start = time.perf_counter()
+                await asyncio.sleep(0.001)
+                delays.append((time.perf_counter() - start - 0.001) * 1000)
+
+        ticker = asyncio.create_task(timer())
+        start = time.perf_counter()
+        await asyncio.gather(*[read(i) for i in range(reads)])
+        elapsed = time.perf_counter() - start
+        done = True
+        await ticker
+        return elapsed, latencies, max(delays, default=0.0)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Inventory resource read throughput, pooled vs per-call connections")
+    parser.add_argument("--reads", type=int, default=3000, help="Resource reads per run")
+    parser.add_argument("--concurrency", type=int, default=32, help="Reads in flight at once")
+    parser.add_argument("--rows", type=int, default=0, help="Generate this many synthetic items instead of "
+                                                             "copying inventory.db")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="read-bench-") as directory:
+        path = os.path.join(directory, "inventory.db")
+        if args.rows:
+            init_db.DB_FILE = path
+            init_db.init_db(args.rows, seed=1)
+        else:
+            shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), init_db.DB_FILE), path)
+        server.change_notifier.path = path
+        pooled = server.db_pool
+        pooled.path = path
+
+        print(f"{args.reads} reads of {len(URIS)} resources, {args.concurrency} in flight\n")
+        for mode, pool in (("per-call", PerCallConnections(path)), ("pooled", pooled)):
+            server.db_pool = pool
+            elapsed, latencies, worst_delay = await read_mix(args.reads, args.concurrency)
+            print(f"{mode:<9} {args.reads / elapsed:8.0f} reads/s  p50={percentile(latencies, 50):7.2f}ms  "
+                  f"p99={percentile(latencies, 99):7.2f}ms  loop blocked up to {worst_delay:.1f}ms")
+        server.db_pool = pooled
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
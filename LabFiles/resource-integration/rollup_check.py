@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Check the trigger-maintained inventory rollups against a full recompute
+
+Builds a throwaway catalog with init_db.py's generator (a million rows by
+default), installs the server's rollup tables and triggers, then applies
+random inserts, updates, deletes and category moves, including NULL
+quantities, prices and categories, and emptying a whole category. Afterwards
+category_stats and inventory_stats must equal the same aggregates computed
+from scratch over items. It also times the summary and category reads with
+and without the rollups:
+
+    python rollup_check.py --rows 1000000 --ops 20000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import init_db
+import server
+
+# Tolerance for the REAL sums, which the triggers accumulate in a different order
+EPSILON = 1e-6
+
+
+def timed(func, repeat):
+    """Mean milliseconds per call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def mutate(conn, ops, seed):
+    """Apply `ops` random writes to items, returning the number of each kind"""
+    rng = random.Random(seed)
+    categories = list(init_db.CATALOG) + ["Garden", None]
+    max_id = conn.execute("SELECT MAX(id) FROM items").fetchone()[0]
+    counts = {"insert": 0, "update": 0, "move": 0, "rename": 0, "delete": 0}
+    for _ in range(ops):
+        roll = rng.random()
+        item_id = rng.randint(1, max_id)
+        if roll < 0.25:
+            conn.execute("INSERT INTO items (name, quantity, price, category) VALUES (?, ?, ?, ?)",
+                         ("check item", rng.choice([None, 0, 7, 120]), rng.choice([None, 0.5, 19.99, 999.0]),
+                          rng.choice(categories)))
+            counts["insert"] += 1
+        elif roll < 0.5:
+            conn.execute("UPDATE items SET quantity = ?, price = ? WHERE id = ?",
+                         (rng.choice([None, 0, 3, 250]), rng.choice([None, 1.25, 49.99]), item_id))
+            counts["update"] += 1
+        elif roll < 0.7:
+            conn.execute("UPDATE items SET category = ? WHERE id = ?", (rng.choice(categories), item_id))
+            counts["move"] += 1
+        elif roll < 0.8:
+            # Not a rollup column, so the update trigger must not fire
+            conn.execute("UPDATE items SET name = 'renamed' WHERE id = ?", (item_id,))
+            counts["rename"] += 1
+        else:
+            conn.execute("DELETE FROM items WHERE id = ?", (item_id,))
+            counts["delete"] += 1
+    # Emptying a category must remove its row, not leave one with zero items
+    conn.execute("DELETE FROM items WHERE category = 'Toys'")
+    conn.commit()
+    return counts
+
+
+def compare(conn):
+    """List of mismatches between the rollup tables and a recompute over items"""
+    problems = []
+    expected = conn.execute("""
+        SELECT COUNT(*), COUNT(DISTINCT category), COALESCE(SUM(quantity * price), 0) FROM items
+    """).fetchone()
+    actual = conn.execute("SELECT item_count, category_count, total_value FROM inventory_stats").fetchone()
+    if expected[:2] != actual[:2] or abs(expected[2] - actual[2]) > EPSILON * max(1, abs(expected[2])):
+        problems.append(f"inventory_stats {actual} != {expected}")
+
+    expected = {row[0]: row[1:] for row in conn.execute("""
+        SELECT category, COUNT(*), COALESCE(SUM(price), 0), COUNT(price), COALESCE(SUM(quantity * price), 0)
+        FROM items WHERE category IS NOT NULL GROUP BY category
+    """)}
+    actual = {row[0]: row[1:] for row in conn.execute(
+        "SELECT category, item_count, price_sum, price_count, total_value FROM category_stats")}
+    for category in expected.keys() | actual.keys():
+        want, got = expected.get(category), actual.get(category)
+        if want is None or got is None:
+            problems.append(f"category {category!r}: rollup {got} != recompute {want}")
+        elif (want[0], want[2]) != (got[0], got[2]) or any(
+                abs(w - g) > EPSILON * max(1, abs(w)) for w, g in ((want[1], got[1]), (want[3], got[3]))):
+            problems.append(f"category {category!r}: rollup {got} != recompute {want}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the inventory rollups against a full recompute")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic items to generate")
+    parser.add_argument("--ops", type=int, default=20_000, help="Random writes to apply")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the catalog and the writes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="rollup-check-") as directory:
+        init_db.DB_FILE = server.db_pool.path = os.path.join(directory, "inventory.db")
+        init_db.init_db(args.rows, args.seed)
+        conn = sqlite3.connect(init_db.DB_FILE)
+
+        def aggregate_summary():
+            for query in ("SELECT COUNT(*) FROM items", "SELECT COUNT(DISTINCT category) FROM items",
+                          "SELECT SUM(quantity * price) FROM items"):
+                conn.execute(query).fetchone()
+
+        def aggregate_category():
+            conn.execute("SELECT COUNT(*), AVG(price), SUM(quantity * price) FROM items WHERE category = ?",
+                         ("Books",)).fetchone()
+
+        print(f"aggregates   summary {timed(aggregate_summary, 5):9.3f}ms  category {timed(aggregate_category, 5):9.3f}ms")
+        start = time.perf_counter()
+        server._ensure_rollups()
+        print(f"initial rollup build {(time.perf_counter() - start) * 1000:.0f}ms")
+        print(f"rollups      summary {timed(server._get_inventory_summary, 1000):9.3f}ms  "
+              f"category {timed(lambda: server._get_category_summary('Books'), 1000):9.3f}ms")
+
+        start = time.perf_counter()
+        counts = mutate(conn, args.ops, args.seed)
+        print(f"applied {args.ops} writes in {time.perf_counter() - start:.1f}s: "
+              + ", ".join(f"{kind}={count}" for kind, count in counts.items()))
+        problems = compare(conn)
+
+        # init_db.py drops the table (and its triggers); the next startup must rebuild
+        init_db.init_db(100, args.seed)
+        server._ensure_rollups()
+        problems += [f"after recreating items: {problem}" for problem in compare(conn)]
+        conn.close()
+        server.db_pool.stop()
+
+    for problem in problems:
+        print(f"FAIL {problem}")
+    print("rollups match a full recompute" if not problems else f"{len(problems)} mismatches")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
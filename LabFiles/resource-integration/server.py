@@ -4,33 +4,523 @@ Starter code for Lab: Resource Integration
 Students will add MCP resource decorators to expose database functions as resources.
 """
 
+import asyncio
+import base64
+import heapq
+import json
+import os
 import sqlite3
 import logging
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import Optional
+from urllib.parse import unquote
 from fastmcp import FastMCP
+from pydantic import AnyUrl
 
 # Reduce logging verbosity for cleaner output
 logging.getLogger("mcp").setLevel(logging.ERROR)
 logging.getLogger("mcp.server").setLevel(logging.ERROR)
 logging.getLogger().setLevel(logging.WARNING)
 
-# Initialize FastMCP server
-mcp = FastMCP("InventoryServer")
 DB_FILE = "inventory.db"
+# Worker threads running queries, each holding one open connection
+DB_POOL_SIZE = int(os.environ.get("INVENTORY_DB_POOL_SIZE", 4))
+# Compiled statements kept per connection, so repeated helper queries skip re-preparing
+DB_STATEMENT_CACHE = 64
+# Items per page for inventory://items and list_items
+ITEMS_PAGE_SIZE = 100
+ITEMS_MAX_PAGE_SIZE = 500
+# Seconds between checks for changes to notify resource subscribers about
+CHANGE_POLL_INTERVAL = float(os.environ.get("INVENTORY_CHANGE_POLL_INTERVAL", 0.5))
+# Recent item changes kept in the change log; older ones are pruned
+CHANGE_LOG_MAX_ROWS = 10_000
+# Reorder threshold for items that have none of their own
+DEFAULT_REORDER_THRESHOLD = 20
+# Most urgent items listed by inventory://low_stock, and stock events kept for get_stock_events
+LOW_STOCK_LIST_SIZE = 100
+STOCK_EVENT_HISTORY = 1000
+
+
+# ===== DATABASE CONNECTION POOL =====
+
+class ConnectionPool:
+    """SQLite connections opened once and reused, with queries run off the event loop
+
+    Each worker thread lazily opens its own connection and keeps it, so a query
+    pays neither the connect nor (through sqlite3's per-connection statement
+    cache) the prepare cost again. Resource and tool handlers hand helpers to
+    run() so a slow query never blocks other MCP requests.
+    """
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="inventory-db")
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        """The calling thread's connection, opened on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False only so stop() can close it; it is never shared
+            conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=DB_STATEMENT_CACHE)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    async def run(self, func, *args):
+        """Run a helper on a pool thread; falls back to asyncio's default executor outside the lifespan"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+
+db_pool = ConnectionPool(DB_FILE, DB_POOL_SIZE)
+_db_pool_users = 0
+
+
+# ===== MATERIALIZED AGGREGATES =====
+
+# Rollups of the items table kept current by triggers, so the summary and
+# category resources read one row instead of aggregating the whole catalog.
+# They live in the database, so writes from any client (init_db.py, the
+# sqlite3 shell) keep them up to date.
+ROLLUP_TABLES = """
+    CREATE TABLE IF NOT EXISTS category_stats (
+        category TEXT PRIMARY KEY,
+        item_count INTEGER NOT NULL,
+        price_sum REAL NOT NULL,
+        price_count INTEGER NOT NULL,
+        total_value REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS inventory_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        item_count INTEGER NOT NULL,
+        category_count INTEGER NOT NULL,
+        total_value REAL NOT NULL
+    );
+"""
+
+# Trigger bodies are built from these halves: an insert adds NEW, a delete
+# removes OLD, and an update does both
+_ROLLUP_ADD = """
+    UPDATE inventory_stats SET item_count = item_count + 1,
+        total_value = total_value + COALESCE(NEW.quantity * NEW.price, 0);
+    INSERT INTO category_stats (category, item_count, price_sum, price_count, total_value)
+        SELECT NEW.category, 1, COALESCE(NEW.price, 0), NEW.price IS NOT NULL,
+               COALESCE(NEW.quantity * NEW.price, 0)
+        WHERE NEW.category IS NOT NULL
+        ON CONFLICT (category) DO UPDATE SET
+            item_count = item_count + 1,
+            price_sum = price_sum + excluded.price_sum,
+            price_count = price_count + excluded.price_count,
+            total_value = total_value + excluded.total_value;
+"""
+_ROLLUP_REMOVE = """
+    UPDATE inventory_stats SET item_count = item_count - 1,
+        total_value = total_value - COALESCE(OLD.quantity * OLD.price, 0);
+    UPDATE category_stats SET
+        item_count = item_count - 1,
+        price_sum = price_sum - COALESCE(OLD.price, 0),
+        price_count = price_count - (OLD.price IS NOT NULL),
+        total_value = total_value - COALESCE(OLD.quantity * OLD.price, 0)
+    WHERE category = OLD.category;
+    DELETE FROM category_stats WHERE category = OLD.category AND item_count = 0;
+"""
+_ROLLUP_CATEGORY_COUNT = """
+    UPDATE inventory_stats SET category_count = (SELECT COUNT(*) FROM category_stats);
+"""
+ROLLUP_TRIGGERS = {
+    "items_rollup_insert": f"AFTER INSERT ON items BEGIN {_ROLLUP_ADD} {_ROLLUP_CATEGORY_COUNT} END",
+    "items_rollup_delete": f"AFTER DELETE ON items BEGIN {_ROLLUP_REMOVE} {_ROLLUP_CATEGORY_COUNT} END",
+    "items_rollup_update": (f"AFTER UPDATE OF quantity, price, category ON items "
+                            f"BEGIN {_ROLLUP_REMOVE} {_ROLLUP_ADD} {_ROLLUP_CATEGORY_COUNT} END"),
+}
+
+REBUILD_ROLLUPS = """
+    DELETE FROM category_stats;
+    INSERT INTO category_stats (category, item_count, price_sum, price_count, total_value)
+        SELECT category, COUNT(*), COALESCE(SUM(price), 0), COUNT(price), COALESCE(SUM(quantity * price), 0)
+        FROM items WHERE category IS NOT NULL GROUP BY category;
+    INSERT OR REPLACE INTO inventory_stats (id, item_count, category_count, total_value)
+        SELECT 1, COUNT(*), COUNT(DISTINCT category), COALESCE(SUM(quantity * price), 0) FROM items;
+"""
+
+
+def _ensure_rollups():
+    """Create the rollup tables and triggers, rebuilding the rollups if any trigger was missing
+
+    Triggers are dropped along with the items table, so a missing trigger means
+    the rollups may have missed writes (e.g. after init_db.py recreated the table).
+    """
+    conn = db_pool.connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for statement in ROLLUP_TABLES.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        has_totals = conn.execute("SELECT 1 FROM inventory_stats").fetchone() is not None
+        if not existing >= ROLLUP_TRIGGERS.keys() or not has_totals:
+            for name, definition in ROLLUP_TRIGGERS.items():
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                conn.execute(f"CREATE TRIGGER {name} {definition}")
+            for statement in REBUILD_ROLLUPS.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+# ===== CHANGE NOTIFICATIONS =====
+
+# Every write to items is logged by triggers, with the old and new values of
+# the columns that decide which resources it affects
+CHANGE_LOG_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS item_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_id INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        old_category TEXT, new_category TEXT,
+        old_quantity INTEGER, new_quantity INTEGER,
+        old_price REAL, new_price REAL
+    );
+    CREATE TRIGGER IF NOT EXISTS items_changelog_insert AFTER INSERT ON items BEGIN
+        INSERT INTO item_changes (item_id, op, new_category, new_quantity, new_price)
+        VALUES (NEW.id, 'insert', NEW.category, NEW.quantity, NEW.price);
+    END;
+    CREATE TRIGGER IF NOT EXISTS items_changelog_update AFTER UPDATE ON items BEGIN
+        INSERT INTO item_changes (item_id, op, old_category, new_category, old_quantity, new_quantity,
+                                  old_price, new_price)
+        VALUES (NEW.id, 'update', OLD.category, NEW.category, OLD.quantity, NEW.quantity, OLD.price, NEW.price);
+    END;
+    CREATE TRIGGER IF NOT EXISTS items_changelog_delete AFTER DELETE ON items BEGIN
+        INSERT INTO item_changes (item_id, op, old_category, old_quantity, old_price)
+        VALUES (OLD.id, 'delete', OLD.category, OLD.quantity, OLD.price);
+    END;
+"""
+
+
+def _ensure_reorder_thresholds():
+    """Add the per-item reorder_threshold column and the index of items below it to older databases"""
+    conn = db_pool.connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(items)")}
+        if "reorder_threshold" not in columns:
+            conn.execute(f"ALTER TABLE items ADD COLUMN reorder_threshold INTEGER NOT NULL "
+                         f"DEFAULT {DEFAULT_REORDER_THRESHOLD}")
+        # Only items currently below their threshold are in this index, so listing them
+        # costs the size of the low-stock set rather than the catalog
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_items_below_reorder ON items (category, name) "
+                     "WHERE quantity < reorder_threshold")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _ensure_category_index():
+    """Add the category index that id-ordered category listings walk (see init_db.INDEXES) to older databases"""
+    conn = db_pool.connection()
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_items_category ON items (category)")
+    conn.commit()
+
+
+def _ensure_change_log():
+    conn = db_pool.connection()
+    try:
+        conn.executescript(f"BEGIN IMMEDIATE; {CHANGE_LOG_SCHEMA} COMMIT;")
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _affects(uri: str, change: tuple) -> bool:
+    """Whether an item_changes row can change what `uri` returns"""
+    item_id, op, old_category, new_category, old_quantity, new_quantity, old_price, new_price = change
+    totals_changed = op != "update" or (old_category, old_quantity, old_price) != (new_category, new_quantity, new_price)
+    if uri == "inventory://summary":
+        return totals_changed
+    if uri == "inventory://categories":
+        return op != "update" or old_category != new_category
+    if match := re.fullmatch(r"inventory://category/([^/]+)", uri):
+        # Subscribers use the URI as read, e.g. inventory://category/Office%20Supplies;
+        # FastMCP unquotes the parameter the same way before calling the resource
+        return totals_changed and unquote(match.group(1)) in (old_category, new_category)
+    if match := re.fullmatch(r"inventory://category/[^/]+/item/(\d+)|inventory://item_summary/(\d+)", uri):
+        return int(match.group(1) or match.group(2)) == item_id
+    if uri.startswith("inventory://low_stock"):
+        # Driven by the low-stock tracker's events instead
+        return False
+    if match := re.fullmatch(r"inventory://items_with_low_stock/(-?\d+)", uri):
+        threshold = int(match.group(1))
+        return any(quantity is not None and quantity < threshold for quantity in (old_quantity, new_quantity))
+    # Item listings show most columns of every item
+    return True
+
+
+class LowStockTracker:
+    """The set of items below their reorder threshold, kept current from the change log
+
+    Loaded once through the partial index of items below threshold, then
+    updated from the ids in each batch of item_changes: only those rows are
+    re-read. Every item entering, leaving or moving within the set becomes a
+    stock event. The inventory://low_stock response is rebuilt once per batch
+    that changed the set, so reads are constant-time whatever the catalog size.
+    """
+
+    LOW_STOCK_QUERY = """
+        SELECT id, name, category, quantity, reorder_threshold
+        FROM items WHERE quantity < reorder_threshold
+    """
+
+    def __init__(self):
+        self.items = {}
+        self._events = deque(maxlen=STOCK_EVENT_HISTORY)
+        self._events_lock = threading.Lock()
+        self._event_seq = 0
+        self._snapshot = self._build_snapshot()
+
+    def load(self, conn: sqlite3.Connection):
+        """Initial load of the low-stock set, without events"""
+        self.items = {row[0]: row for row in conn.execute(self.LOW_STOCK_QUERY)}
+        self._snapshot = self._build_snapshot()
+
+    def reload(self, conn: sqlite3.Connection) -> bool:
+        """Re-read the whole low-stock set; returns whether it changed"""
+        current = {row[0]: row for row in conn.execute(self.LOW_STOCK_QUERY)}
+        # Read items that left the set too, so their events carry the new quantity
+        current.update(self._read(conn, self.items.keys() - current.keys()))
+        return self._update(current, self.items.keys() | current.keys())
+
+    def apply(self, conn: sqlite3.Connection, item_ids: set) -> bool:
+        """Re-read changed items; returns whether the low-stock set changed"""
+        return self._update(self._read(conn, item_ids), item_ids)
+
+    @staticmethod
+    def _read(conn: sqlite3.Connection, item_ids) -> dict:
+        rows, ids = {}, list(item_ids)
+        # Chunked to stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows.update((row[0], row) for row in conn.execute(f"""
+                SELECT id, name, category, quantity, reorder_threshold
+                FROM items WHERE id IN ({",".join("?" * len(chunk))})
+            """, chunk))
+        return rows
+
+    def _update(self, rows: dict, item_ids) -> bool:
+        """Apply the current rows of item_ids (missing ones were deleted) and record events"""
+        events = []
+        for item_id in item_ids:
+            old, row = self.items.get(item_id), rows.get(item_id)
+            low = row is not None and row[3] is not None and row[3] < row[4]
+            if low:
+                if old != row:
+                    self.items[item_id] = row
+                    events.append(("low" if old is None else "changed", row))
+            elif old is not None:
+                del self.items[item_id]
+                events.append(("restocked", row) if row is not None else ("removed", old))
+        if not events:
+            return False
+        timestamp = datetime.now().isoformat()
+        with self._events_lock:
+            for event, (item_id, name, category, quantity, threshold) in events:
+                self._event_seq += 1
+                self._events.append({"seq": self._event_seq, "event": event, "id": item_id, "name": name,
+                                     "category": category, "quantity": quantity, "reorder_threshold": threshold,
+                                     "timestamp": timestamp})
+        self._snapshot = self._build_snapshot()
+        return True
+
+    def _build_snapshot(self) -> dict:
+        # Most urgent first: largest shortfall below the threshold
+        urgent = heapq.nsmallest(LOW_STOCK_LIST_SIZE, self.items.values(), key=lambda row: (row[3] - row[4], row[0]))
+        return {
+            "low_stock_count": len(self.items),
+            "items": [{"id": row[0], "name": row[1], "category": row[2], "quantity": row[3],
+                       "reorder_threshold": row[4]} for row in urgent],
+            "latest_event_seq": self._event_seq,
+            "as_of": datetime.now().isoformat(),
+            "usage_hint": "Subscribe to inventory://low_stock for updates; read "
+                          "inventory://low_stock/events/{after_seq} for what changed since latest_event_seq"
+        }
+
+    def snapshot(self) -> dict:
+        return self._snapshot
+
+    def events_after(self, after_seq: int, limit: int = ITEMS_PAGE_SIZE) -> dict:
+        with self._events_lock:
+            events = [event for event in self._events if event["seq"] > after_seq][:limit]
+            oldest = self._events[0]["seq"] if self._events else self._event_seq + 1
+            latest = self._event_seq
+        return {
+            "events": events,
+            "latest_event_seq": latest,
+            # Events before the oldest kept one are gone; re-read inventory://low_stock instead
+            "missed_events": after_seq < oldest - 1,
+        }
+
+
+class ChangeNotifier:
+    """Sends resources/updated to subscribed sessions when the rows behind a resource change
+
+    Clients subscribe to resource URIs instead of re-reading them to spot
+    changes. A dedicated connection checks PRAGMA data_version, which only
+    moves when another connection commits, so an idle database costs one
+    pragma per poll. When it moves, the new item_changes rows are matched
+    against the subscribed URIs and each affected one is notified once.
+    """
+
+    def __init__(self, path: str, interval: float, low_stock: LowStockTracker):
+        self.path = path
+        self.interval = interval
+        self.low_stock = low_stock
+        self.subscriptions = {}
+        self._conn = None
+        self._task = None
+        self._data_version = None
+        self._last_seq = 0
+        self._pruned_at = 0
+
+    def subscribe(self, uri: str, session):
+        self.subscriptions.setdefault(uri, set()).add(session)
+
+    def unsubscribe(self, uri: str, session):
+        sessions = self.subscriptions.get(uri, set())
+        sessions.discard(session)
+        if not sessions:
+            self.subscriptions.pop(uri, None)
+
+    async def start(self):
+        # Autocommit, so every poll sees the latest committed data
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._last_seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM item_changes").fetchone()[0]
+        self._pruned_at = self._last_seq
+        await asyncio.to_thread(self.low_stock.load, self._conn)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _poll(self) -> Optional[set]:
+        """URIs affected by changes committed since the last poll, or None if nothing changed"""
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return None
+        self._data_version = data_version
+        first, last = self._conn.execute("SELECT MIN(seq), MAX(seq) FROM item_changes WHERE seq > ?",
+                                         (self._last_seq,)).fetchone()
+        if last is None:
+            return set()
+        subscribed = list(self.subscriptions)
+        if first > self._last_seq + 1 or last - self._last_seq > CHANGE_LOG_MAX_ROWS:
+            # Rows were pruned before we read them (or there are too many to be worth matching)
+            affected = set(subscribed)
+            low_stock_changed = self.low_stock.reload(self._conn)
+        else:
+            affected, changed_ids = set(), set()
+            rows = self._conn.execute("""
+                SELECT item_id, op, old_category, new_category, old_quantity, new_quantity, old_price, new_price
+                FROM item_changes WHERE seq > ? AND seq <= ?
+            """, (self._last_seq, last))
+            for change in rows:
+                changed_ids.add(change[0])
+                if len(affected) < len(subscribed):
+                    affected.update(uri for uri in subscribed if uri not in affected and _affects(uri, change))
+            low_stock_changed = self.low_stock.apply(self._conn, changed_ids)
+        if low_stock_changed:
+            affected.update(uri for uri in subscribed if uri.startswith("inventory://low_stock"))
+        self._last_seq = last
+        if last - self._pruned_at >= 1000:
+            # Every server process prunes; the limit leaves slower pollers time to read
+            self._conn.execute("DELETE FROM item_changes WHERE seq <= ?", (last - CHANGE_LOG_MAX_ROWS,))
+            self._pruned_at = last
+        return affected
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                affected = await asyncio.to_thread(self._poll)
+            except sqlite3.Error as e:
+                logging.warning(f"Checking for inventory changes failed: {e}")
+                continue
+            for uri in affected or ():
+                for session in list(self.subscriptions.get(uri, ())):
+                    try:
+                        await session.send_resource_updated(AnyUrl(uri))
+                    except Exception:
+                        # The session has gone away
+                        self.unsubscribe(uri, session)
+
+
+low_stock = LowStockTracker()
+change_notifier = ChangeNotifier(DB_FILE, CHANGE_POLL_INTERVAL, low_stock)
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP):
+    """Start the connection pool and change notifier with the server and close them when the last session ends"""
+    global _db_pool_users
+    _db_pool_users += 1
+    try:
+        if _db_pool_users == 1:
+            db_pool.start()
+            await db_pool.run(_ensure_rollups)
+            await db_pool.run(_ensure_reorder_thresholds)
+            await db_pool.run(_ensure_category_index)
+            await db_pool.run(_ensure_change_log)
+            await change_notifier.start()
+        yield
+    finally:
+        _db_pool_users -= 1
+        if _db_pool_users == 0:
+            await change_notifier.stop()
+            await asyncio.to_thread(db_pool.stop)
+
+
+# Initialize FastMCP server
+mcp = FastMCP("InventoryServer", lifespan=server_lifespan)
 
 
 # ===== HELPER FUNCTIONS (shared by resources and tools) =====
 
 def _get_inventory_summary() -> dict:
-    conn = sqlite3.connect(DB_FILE)
+    conn = db_pool.connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM items")
-    total_items = cursor.fetchone()[0]
-    cursor.execute("SELECT COUNT(DISTINCT category) FROM items")
-    total_categories = cursor.fetchone()[0]
-    cursor.execute("SELECT SUM(quantity * price) FROM items")
-    total_value = cursor.fetchone()[0] or 0
-    conn.close()
+    cursor.execute("SELECT item_count, category_count, total_value FROM inventory_stats WHERE id = 1")
+    total_items, total_categories, total_value = cursor.fetchone()
     return {
         "total_items": total_items,
         "total_categories": total_categories,
@@ -40,25 +530,21 @@ def _get_inventory_summary() -> dict:
 
 
 def _get_category_summary(cat: str) -> str:
-    conn = sqlite3.connect(DB_FILE)
+    conn = db_pool.connection()
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT 
-            COUNT(*) as item_count,
-            AVG(price) as avg_price,
-            SUM(quantity * price) as total_value
-        FROM items 
+        SELECT item_count, price_sum / NULLIF(price_count, 0) as avg_price, total_value
+        FROM category_stats
         WHERE category = ?
     """, (cat,))
     result = cursor.fetchone()
-    conn.close()
-    if result[0] == 0:
+    if not result:
         return f"No items found in category '{cat}'"
-    return f"Category: {cat}\nItems: {result[0]}\nAverage Price: ${result[1]:.2f}\nTotal Value: ${result[2]:.2f}"
+    return f"Category: {cat}\nItems: {result[0]}\nAverage Price: ${result[1] or 0:.2f}\nTotal Value: ${result[2]:.2f}"
 
 
 def _get_item_in_category(cat: str, item_id: int) -> dict:
-    conn = sqlite3.connect(DB_FILE)
+    conn = db_pool.connection()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT name, quantity, price, description, last_updated
@@ -66,7 +552,6 @@ def _get_item_in_category(cat: str, item_id: int) -> dict:
         WHERE category = ? AND id = ?
     """, (cat, item_id))
     result = cursor.fetchone()
-    conn.close()
     if not result:
         raise ValueError(f"Item {item_id} not found in category '{cat}'")
     return {
@@ -81,7 +566,7 @@ def _get_item_in_category(cat: str, item_id: int) -> dict:
 
 
 def _get_item_summary(item_id: int) -> dict:
-    conn = sqlite3.connect(DB_FILE)
+    conn = db_pool.connection()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT name, quantity, price, category, description
@@ -89,7 +574,6 @@ def _get_item_summary(item_id: int) -> dict:
         WHERE id = ?
     """, (item_id,))
     item = cursor.fetchone()
-    conn.close()
     if not item:
         return {"error": f"Item {item_id} not found"}
     return {
@@ -103,16 +587,14 @@ def _get_item_summary(item_id: int) -> dict:
 
 
 def _get_categories() -> dict:
-    conn = sqlite3.connect(DB_FILE)
+    conn = db_pool.connection()
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT category, COUNT(*) as item_count 
-        FROM items 
-        GROUP BY category 
+        SELECT category, item_count
+        FROM category_stats
         ORDER BY category
     """)
     categories = cursor.fetchall()
-    conn.close()
     return {
         "available_categories": [
             {"name": cat[0], "item_count": cat[1]} for cat in categories
@@ -121,26 +603,115 @@ def _get_categories() -> dict:
     }
 
 
-def _get_all_items() -> dict:
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
+def _item_row(item) -> dict:
+    return {"id": item[0], "name": item[1], "category": item[2], "price": f"${item[3]:.2f}", "quantity": item[4]}
+
+
+def _check_page_size(limit: int):
+    if not 1 <= limit <= ITEMS_MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {ITEMS_MAX_PAGE_SIZE}")
+
+
+def _fetch_page(sql: str, params: tuple, limit: int) -> tuple:
+    """Run a keyset query and read at most `limit` rows from the cursor, one at a time
+
+    The query must select limit + 1 rows so that a following page can be
+    detected without counting. Returns (items, last_row, has_more).
+    """
+    cursor = db_pool.connection().execute(sql, params + (limit + 1,))
+    items, last = [], None
+    for row in cursor:
+        if len(items) == limit:
+            cursor.close()
+            return items, last, True
+        items.append(_item_row(row))
+        last = row
+    return items, last, False
+
+
+def _encode_items_cursor(row) -> str:
+    """Opaque cursor for the (category, name, id) position after `row`"""
+    return base64.urlsafe_b64encode(json.dumps([row[2], row[1], row[0]]).encode()).decode()
+
+
+def _decode_items_cursor(cursor: str) -> tuple:
+    try:
+        category, name, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return category, name, int(item_id)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+
+def _keyset_after(keys: list) -> tuple:
+    """SQL condition and params for rows after `keys`, a list of (column, value) in sort order
+
+    NULLs sort first in SQLite but never compare greater than anything, so a
+    NULL value matches the column's remaining NULLs and then every non-NULL.
+    The last column must be non-NULL (the id).
+    """
+    column, value = keys[0]
+    if len(keys) == 1:
+        return f"{column} > ?", (value,)
+    rest, params = _keyset_after(keys[1:])
+    if value is None:
+        return f"({column} IS NOT NULL OR ({column} IS NULL AND {rest}))", params
+    # The leading >= lets the planner seek into the index instead of walking it from the start
+    return f"{column} >= ? AND ({column} > ? OR {rest})", (value, value) + params
+
+
+def _get_items_page(cursor: Optional[str] = None, limit: int = ITEMS_PAGE_SIZE) -> dict:
+    """One page of items ordered by category and name, continuing after `cursor`"""
+    _check_page_size(limit)
+    after, params = "", ()
+    if cursor:
+        category, name, item_id = _decode_items_cursor(cursor)
+        if category is not None and name is not None:
+            after, params = "WHERE (category, name, id) > (?, ?, ?)", (category, name, item_id)
+        else:
+            # A row-value comparison with a NULL is never true, which would end the listing early
+            condition, params = _keyset_after([("category", category), ("name", name), ("id", item_id)])
+            after = f"WHERE {condition}"
+    # Keyset paging walks the (category, name) index, so every page costs the same
+    items, last, has_more = _fetch_page(f"""
         SELECT id, name, category, price, quantity
-        FROM items 
-        ORDER BY category, name
-    """)
-    items = cursor.fetchall()
-    conn.close()
+        FROM items
+        {after}
+        ORDER BY category, name, id
+        LIMIT ?
+    """, params, limit)
+    next_cursor = _encode_items_cursor(last) if has_more else None
     return {
-        "items": [
-            {"id": item[0], "name": item[1], "category": item[2], "price": f"${item[3]:.2f}", "quantity": item[4]}
-            for item in items
-        ],
+        "items": items,
+        "next_cursor": next_cursor,
         "usage_hint": "Use item IDs with inventory://category/{cat}/item/{item_id} or inventory://item_summary/{item_id}"
+                      + ("; read inventory://items/page/{next_cursor} for more items" if next_cursor else "")
+    }
+
+
+def _list_items(limit: int = ITEMS_PAGE_SIZE, after_id: Optional[int] = None, category: Optional[str] = None) -> dict:
+    """Items ordered by id after `after_id`, optionally within one category"""
+    _check_page_size(limit)
+    conditions, params = ["id > ?"], [after_id or 0]
+    if category is not None:
+        # idx_items_category holds each category's rows in id order, so this is
+        # a range read of `limit` entries whether or not the category exists
+        conditions.append("category = ?")
+        params.append(category)
+    items, last, has_more = _fetch_page(f"""
+        SELECT id, name, category, price, quantity
+        FROM items
+        WHERE {" AND ".join(conditions)}
+        ORDER BY id
+        LIMIT ?
+    """, tuple(params), limit)
+    return {
+        "items": items,
+        "next_after_id": last[0] if has_more else None,
+        "usage_hint": "Pass next_after_id as after_id to fetch the next page"
     }
 
 def _get_items_with_low_stock( low_stock_threshold: int = 20 ) -> dict:
-    conn = sqlite3.connect(DB_FILE)
+    conn = db_pool.connection()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT id, name, quantity,category, price
@@ -148,7 +719,6 @@ def _get_items_with_low_stock( low_stock_threshold: int = 20 ) -> dict:
         WHERE quantity < ?
     """, (low_stock_threshold,))
     items = cursor.fetchall()
-    conn.close()
     return {
         "items": [
             {"id": item[0], "name": item[1], "quantity": item[2], "price": item[3], "category": item[4]}
@@ -162,78 +732,154 @@ def _get_items_with_low_stock( low_stock_threshold: int = 20 ) -> dict:
 @mcp.resource("inventory://summary")
 async def get_inventory_summary() -> dict:
     """Provides overall inventory statistics"""
-    return _get_inventory_summary()
+    return await db_pool.run(_get_inventory_summary)
 
 
 @mcp.resource("inventory://category/{cat}")
 async def get_category_summary(cat: str) -> str:
     """Dynamic stats for any category"""
-    return _get_category_summary(cat)
+    return await db_pool.run(_get_category_summary, cat)
 
 
 @mcp.resource("inventory://category/{cat}/item/{item_id}")
 async def get_item_in_category(cat: str, item_id: int) -> dict:
     """Get detailed information about a specific item in a category"""
-    return _get_item_in_category(cat, item_id)
+    return await db_pool.run(_get_item_in_category, cat, item_id)
 
 
 @mcp.resource("inventory://item_summary/{item_id}")
 async def get_item_summary(item_id: int) -> dict:
     """Comprehensive item summary combining item details and category stats"""
-    return _get_item_summary(item_id)
+    return await db_pool.run(_get_item_summary, item_id)
 
 
 @mcp.resource("inventory://categories")
 async def get_categories() -> dict:
     """Lists all available categories in the inventory system"""
-    return _get_categories()
+    return await db_pool.run(_get_categories)
 
 
 @mcp.resource("inventory://items")
 async def get_all_items() -> dict:
-    """Lists all items with their IDs for easy reference"""
-    return _get_all_items()
+    """Lists items with their IDs for easy reference, first page; follow next_cursor for more"""
+    return await db_pool.run(_get_items_page)
+
+
+@mcp.resource("inventory://items/page/{cursor}")
+async def get_items_page(cursor: str) -> dict:
+    """The page of items after a next_cursor from inventory://items or a previous page"""
+    return await db_pool.run(_get_items_page, cursor)
 
 @mcp.resource("inventory://items_with_low_stock/{low_stock_threshold}")
 async def get_items_with_low_stock( low_stock_threshold: int = 20 ) -> dict:
     """Get items with low stock"""
-    return _get_items_with_low_stock( low_stock_threshold )
+    return await db_pool.run(_get_items_with_low_stock, low_stock_threshold)
+
+
+@mcp.resource("inventory://low_stock")
+async def get_low_stock() -> dict:
+    """Items below their own reorder threshold, most urgent first"""
+    return low_stock.snapshot()
+
+
+@mcp.resource("inventory://low_stock/events/{after_seq}")
+async def get_stock_events_after(after_seq: int) -> dict:
+    """Stock events (low, changed, restocked, removed) after a latest_event_seq from inventory://low_stock"""
+    return low_stock.events_after(after_seq)
+
+
+# ===== RESOURCE SUBSCRIPTIONS =====
+
+# FastMCP (2.12.4, pinned in requirements.txt) has no public API for
+# resources/subscribe: @mcp.resource only registers reads, and the server answers
+# subscribe requests with "method not found" unless the low-level MCP server has
+# handlers. So the handlers go on mcp._mcp_server, a private attribute that a
+# FastMCP upgrade may rename or wrap
+@mcp._mcp_server.subscribe_resource()
+async def subscribe_resource(uri: AnyUrl):
+    change_notifier.subscribe(str(uri), mcp._mcp_server.request_context.session)
+
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe_resource(uri: AnyUrl):
+    change_notifier.unsubscribe(str(uri), mcp._mcp_server.request_context.session)
+
+
+def _advertise_subscriptions(server):
+    """The MCP SDK always reports resources.subscribe as false; report it once handlers exist
+
+    Server.get_capabilities() (mcp 1.18.0) hardcodes subscribe=False and
+    neither FastMCP nor the SDK takes an option to change it, so clients that
+    check the capability would never subscribe. Wrapping the method is the
+    only way to advertise it; drop this once the SDK derives the flag from
+    the registered handlers.
+    """
+    get_capabilities = server.get_capabilities
+
+    def get_capabilities_with_subscribe(*args, **kwargs):
+        capabilities = get_capabilities(*args, **kwargs)
+        if capabilities.resources is not None:
+            capabilities.resources.subscribe = True
+        return capabilities
+
+    server.get_capabilities = get_capabilities_with_subscribe
+
+
+_advertise_subscriptions(mcp._mcp_server)
+
 
 # ===== TOOLS (for agent interaction) =====
 
 @mcp.tool()
 async def list_categories() -> dict:
     """List all available inventory categories"""
-    return _get_categories()
+    return await db_pool.run(_get_categories)
 
 
 @mcp.tool()
-async def list_items() -> dict:
-    """List all items in the inventory"""
-    return _get_all_items()
+async def list_items(limit: int = ITEMS_PAGE_SIZE, after_id: Optional[int] = None,
+                     category: Optional[str] = None) -> dict:
+    """List inventory items by ID, a page at a time
+
+    Args:
+        limit: Items per page (1-500)
+        after_id: next_after_id from the previous call, to fetch the following page
+        category: Only list items in this category
+    """
+    return await db_pool.run(_list_items, limit, after_id, category)
 
 
 @mcp.tool()
 async def get_summary() -> dict:
     """Get overall inventory statistics"""
-    return _get_inventory_summary()
+    return await db_pool.run(_get_inventory_summary)
 
 
 @mcp.tool()
 async def get_category(category: str) -> str:
     """Get statistics for a specific category"""
-    return _get_category_summary(category)
+    return await db_pool.run(_get_category_summary, category)
 
 
 @mcp.tool()
 async def get_item(item_id: int) -> dict:
     """Get details for a specific item by ID"""
-    return _get_item_summary(item_id)
+    return await db_pool.run(_get_item_summary, item_id)
 
 @mcp.tool()
 async def get_items_with_low_stock( low_stock_threshold: int = 20 ) -> dict:
     """Get items with low stock"""
-    return _get_items_with_low_stock( low_stock_threshold )
+    return await db_pool.run(_get_items_with_low_stock, low_stock_threshold)
+
+@mcp.tool()
+async def get_low_stock_alerts() -> dict:
+    """Get items below their reorder threshold, most urgent first"""
+    return low_stock.snapshot()
+
+@mcp.tool()
+async def get_stock_events(after_seq: int = 0) -> dict:
+    """Get stock events (item went low, changed while low, restocked, removed) after a given event sequence number"""
+    return low_stock.events_after(after_seq)
 
 if __name__ == "__main__":
     mcp.run()